@@ -141,6 +141,12 @@ echo [OK] migrations/versions/initial_schema.py
 python -c "import urllib.request; urllib.request.urlretrieve('https://raw.githubusercontent.com/moranlevy420/birmanet/main/migrations/versions/20241214_0002_add_system_settings.py', 'migrations/versions/20241214_0002_add_system_settings.py')"
 echo [OK] migrations/versions/system_settings.py
 
+python -c "import urllib.request; urllib.request.urlretrieve('https://raw.githubusercontent.com/moranlevy420/birmanet/main/migrations/versions/20241215_0003_unique_session_token.py', 'migrations/versions/20241215_0003_unique_session_token.py')"
+echo [OK] migrations/versions/unique_session_token.py
+
+python -c "import urllib.request; urllib.request.urlretrieve('https://raw.githubusercontent.com/moranlevy420/birmanet/main/migrations/versions/20241216_0004_hash_session_tokens.py', 'migrations/versions/20241216_0004_hash_session_tokens.py')"
+echo [OK] migrations/versions/hash_session_tokens.py
+
 REM Download scripts
 python -c "import urllib.request; urllib.request.urlretrieve('https://raw.githubusercontent.com/moranlevy420/birmanet/main/scripts/init_admins.py', 'scripts/init_admins.py')"
 echo [OK] scripts/init_admins.py
@@ -28,7 +28,7 @@ from config.settings import (
 from models.dataset import DatasetRegistry
 
 # Import services
-from services.cache_service import SQLiteCacheService
+from services.cache_service import create_cache_service
 from services.data_service import DataService
 from services.update_service import UpdateService
 from services.db_service import get_db_service, init_db
@@ -55,13 +55,18 @@ from ui.components.auth import check_auth, render_user_menu, is_admin, get_cooki
 from utils.formatters import calculate_trailing_1y_yield
 
 
+@st.cache_resource
 def initialize_services():
-    """Initialize application services."""
+    """
+    Initialize application services, once per process: they hold open
+    cache connections and HTTP sessions, so building them on every rerun
+    would leak those.
+    """
     # Dataset registry
     dataset_registry = DatasetRegistry(CONFIG_DIR / "datasets.json")
     
     # Cache service
-    cache_service = SQLiteCacheService(
+    cache_service = create_cache_service(
         cache_dir=CACHE_DIR,
         max_age_hours=CACHE_MAX_AGE_HOURS
     )
@@ -164,8 +169,18 @@ def main():
     init_db()
     db_service = get_db_service()
     
-    # Create auth service with session
+    # One session per script run; closing it returns its pooled connection
+    # (also when the run ends early through st.rerun() or st.stop())
     db_session = db_service.get_session_instance()
+    try:
+        render_app(db_session)
+    finally:
+        db_session.close()
+
+
+def render_app(db_session):
+    """Render the app for one script run, using db_session for auth and settings."""
+    # Create auth service with session
     auth_service = AuthService(db_session)
     find_better_service = FindBetterService(db_session)
     
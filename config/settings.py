@@ -92,6 +92,8 @@ UPDATE_FILES = [
     "migrations/script.py.mako",
     "migrations/versions/20241213_0001_initial_schema.py",
     "migrations/versions/20241214_0002_add_system_settings.py",
+    "migrations/versions/20241215_0003_unique_session_token.py",
+    "migrations/versions/20241216_0004_hash_session_tokens.py",
 ]
 
 # Display columns for the data table
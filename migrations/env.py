@@ -72,6 +72,19 @@ def run_migrations_online() -> None:
     
     Creates an Engine and associates a connection with the context.
     """
+    # Reuse the caller's connection (and its transaction) when one is given
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            compare_server_default=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+    
     # Override sqlalchemy.url in config
     configuration = config.get_section(config.config_ini_section)
     configuration["sqlalchemy.url"] = get_url()
@@ -0,0 +1,34 @@
+"""Make the users.session_token index unique
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-12-15
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def _drop_token_index_if_exists() -> None:
+    """Drop the session_token index; 0002 and legacy upgrades don't always create it."""
+    indexes = sa.inspect(op.get_bind()).get_indexes('users')
+    if any(index['name'] == 'ix_users_session_token' for index in indexes):
+        op.drop_index('ix_users_session_token', 'users')
+
+
+def upgrade() -> None:
+    # Tokens are random, so existing rows can't collide (NULLs are allowed)
+    _drop_token_index_if_exists()
+    op.create_index('ix_users_session_token', 'users', ['session_token'], unique=True)
+
+
+def downgrade() -> None:
+    _drop_token_index_if_exists()
+    op.create_index('ix_users_session_token', 'users', ['session_token'])
@@ -0,0 +1,36 @@
+"""Store SHA-256 hashes of session tokens instead of the raw tokens
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-12-16
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Hash tokens in place so existing logins keep working
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text("SELECT id, session_token FROM users WHERE session_token IS NOT NULL")
+    ).fetchall()
+    for user_id, token in rows:
+        conn.execute(
+            sa.text("UPDATE users SET session_token = :token_hash WHERE id = :id"),
+            {"token_hash": hashlib.sha256(token.encode('utf-8')).hexdigest(), "id": user_id}
+        )
+
+
+def downgrade() -> None:
+    # Hashes can't be turned back into tokens; everyone logs in again
+    op.execute("UPDATE users SET session_token = NULL, session_expires = NULL")
@@ -165,7 +165,7 @@ class PensiaAnalyzer:
         }.get(period, 'MONTHLY_YIELD')
         
         result = (
-            self.df.groupby(['FUND_ID', 'FUND_NAME', 'MANAGING_CORPORATION'])
+            self.df.groupby(['FUND_ID', 'FUND_NAME', 'MANAGING_CORPORATION'], observed=True)
             .agg({
                 yield_col: 'mean',
                 'TOTAL_ASSETS': 'last',
@@ -228,7 +228,7 @@ class PensiaAnalyzer:
     def compare_corporations(self) -> pd.DataFrame:
         """Compare performance across managing corporations."""
         return (
-            self.df.groupby('MANAGING_CORPORATION')
+            self.df.groupby('MANAGING_CORPORATION', observed=True)
             .agg({
                 'FUND_ID': 'nunique',
                 'TOTAL_ASSETS': 'sum',
@@ -7,11 +7,18 @@ Run with: streamlit run pensia_app.py
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 import sqlite3
 import json
+import hashlib
+import io
+from functools import lru_cache
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -30,6 +37,14 @@ GITHUB_BRANCH = "main"
 GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO}/{GITHUB_BRANCH}"
 UPDATE_FILES = ["pensia_app.py", "requirements.txt", "run_app.bat", "INSTALL_WINDOWS.bat", "UNINSTALL_WINDOWS.bat", "UPDATE_WINDOWS.bat"]
 
+# Shared GitHub session (connection reuse + light retry)
+_GH_SESSION = requests.Session()
+_GH_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=len(UPDATE_FILES),
+    max_retries=Retry(total=2, backoff_factor=0.2)
+))
+
 # Page configuration
 st.set_page_config(
     page_title="Find Better",
@@ -181,11 +196,12 @@ st.markdown("""
 VERSION = "1.3.1"
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def check_for_updates():
-    """Check GitHub for a newer version."""
+    """Check GitHub for a newer version (at most once an hour)."""
     try:
         # Fetch the latest pensia_app.py to get the version
-        response = requests.get(f"{GITHUB_RAW_URL}/pensia_app.py", timeout=5)
+        response = _GH_SESSION.get(f"{GITHUB_RAW_URL}/pensia_app.py", timeout=5)
         if response.status_code == 200:
             content = response.text
             # Extract VERSION from the file
@@ -198,25 +214,34 @@ def check_for_updates():
         return None, False
 
 
+def _download_update_file(filename):
+    """Download a single file from GitHub. Returns an error string or None."""
+    try:
+        response = _GH_SESSION.get(f"{GITHUB_RAW_URL}/{filename}", timeout=30)
+        if response.status_code == 200:
+            file_path = Path(__file__).parent / filename
+            # Write the new content
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            return None
+        return f"{filename}: HTTP {response.status_code}"
+    except Exception as e:
+        return f"{filename}: {str(e)}"
+
+
 def download_updates():
     """Download and apply updates from GitHub."""
-    app_dir = Path(__file__).parent
     updated_files = []
     errors = []
     
-    for filename in UPDATE_FILES:
-        try:
-            response = requests.get(f"{GITHUB_RAW_URL}/{filename}", timeout=30)
-            if response.status_code == 200:
-                file_path = app_dir / filename
-                # Write the new content
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(response.text)
-                updated_files.append(filename)
+    # Files are independent, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = executor.map(_download_update_file, UPDATE_FILES)
+        for filename, error in zip(UPDATE_FILES, results):
+            if error:
+                errors.append(error)
             else:
-                errors.append(f"{filename}: HTTP {response.status_code}")
-        except Exception as e:
-            errors.append(f"{filename}: {str(e)}")
+                updated_files.append(filename)
     
     return updated_files, errors
 
@@ -230,6 +255,7 @@ def parse_version(version_str):
         return (0, 0, 0)
 
 
+@lru_cache(maxsize=256)
 def is_newer_version(remote_version, local_version):
     """Check if remote version is newer than local version."""
     return parse_version(remote_version) > parse_version(local_version)
@@ -323,6 +349,14 @@ DISPLAY_COLUMNS = [
     'FUND_CLASSIFICATION',
 ]
 
+# Columns kept after fetch (display columns plus keys/filters used by the app)
+USED_COLUMNS = DISPLAY_COLUMNS + [
+    'REPORT_PERIOD',
+    'MANAGING_CORPORATION',
+    'PARENT_COMPANY_NAME',
+    'CURRENT_DATE',
+]
+
 # Column display names
 COLUMN_LABELS = {
     'FUND_ID': 'Fund ID',
@@ -345,9 +379,15 @@ COLUMN_LABELS = {
     'CURRENT_DATE': 'Data Date',
 }
 
+# Display name -> original column name (for mapping grid sort back to data)
+REVERSE_COLUMN_LABELS = {v: k for k, v in COLUMN_LABELS.items()}
+
 # Color palette
 COLORS = ['#2563eb', '#7c3aed', '#059669', '#d97706', '#dc2626', '#0891b2', '#be185d', '#4f46e5', '#065f46', '#9333ea']
 
+# Max points per line trace before downsampling
+MAX_CHART_POINTS = 800
+
 
 def save_column_order(column_order):
     """Save column order to JSON file."""
@@ -472,40 +512,86 @@ def fetch_from_api(dataset_type="pension"):
     # Remove duplicates (same FUND_ID and REPORT_PERIOD)
     df = df.drop_duplicates(subset=['FUND_ID', 'REPORT_PERIOD'], keep='first')
     
+    # Drop columns the app never reads (plus this dataset's population filter column)
+    keep_cols = list(USED_COLUMNS)
+    population_filter = DATASETS[dataset_type].get("population_filter")
+    if population_filter:
+        keep_cols.append(population_filter["column"])
+    df = df[[col for col in keep_cols if col in df.columns]]
+    
     # Create date column for plotting
     df['REPORT_DATE'] = pd.to_datetime(df['REPORT_PERIOD'].astype(str), format='%Y%m')
     
     # Check if exposure values need conversion (if max > 100, they're absolute values)
     exposure_cols = ['STOCK_MARKET_EXPOSURE', 'FOREIGN_EXPOSURE', 'FOREIGN_CURRENCY_EXPOSURE']
-    for col in exposure_cols:
-        if col in df.columns:
-            if df[col].max() > 100:
-                df[col] = (df[col] / df['TOTAL_ASSETS'] * 100).round(2)
+    present = [col for col in exposure_cols if col in df.columns]
+    if present:
+        maxes = df[present].max()
+        fix_cols = maxes[maxes > 100].index.tolist()
+        if fix_cols:
+            # One broadcasted divide over the sub-matrix instead of a pass per column
+            totals = df['TOTAL_ASSETS'].to_numpy(dtype=float)[:, None]
+            df[fix_cols] = (df[fix_cols].to_numpy(dtype=float) / totals * 100).round(2)
     
     return df
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def fetch_all_data(dataset_type="pension", force_refresh=False):
     """Fetch data from cache or API."""
     cache_age = get_cache_age(dataset_type)
     
     # Use cache if exists and not too old
+    df = None
     if not force_refresh and cache_age is not None and cache_age < CACHE_MAX_AGE_HOURS:
         df = load_from_cache(dataset_type)
-        if df is not None:
-            return df
     
-    # Fetch from API
-    df = fetch_from_api(dataset_type)
+    if df is None:
+        # Fetch from API
+        df = fetch_from_api(dataset_type)
+        
+        # Save to cache
+        if not df.empty:
+            save_to_cache(df, dataset_type)
     
-    # Save to cache
-    if not df.empty:
-        save_to_cache(df, dataset_type)
+    # Lowercased names for the search box (derived, not persisted)
+    if 'FUND_NAME' in df.columns:
+        df['FUND_NAME_LC'] = df['FUND_NAME'].str.lower()
     
     return df
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_assets_bounds(dataset_type="pension"):
+    """Max TOTAL_ASSETS per REPORT_PERIOD, for the minimum-assets slider."""
+    df = fetch_all_data(dataset_type)
+    if df.empty:
+        return {}
+    return df.groupby('REPORT_PERIOD')['TOTAL_ASSETS'].max().dropna().to_dict()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_data_with_period_index(dataset_type="pension"):
+    """
+    fetch_all_data's frame together with lookups into it, cached as one
+    entry so after a refresh or TTL expiry they can never point into a
+    different frame:
+    - row positions of each REPORT_PERIOD
+    - row positions sorted by (FUND_ID, REPORT_DATE), for per-fund history
+      slices (just an index and positions, not a second copy of the data)
+    """
+    df = fetch_all_data(dataset_type)
+    if df.empty:
+        return df, {}, pd.Series(dtype=np.int64)
+    
+    history_index = pd.Series(
+        np.arange(len(df)),
+        index=pd.MultiIndex.from_arrays([df['FUND_ID'], df['REPORT_DATE']])
+    ).sort_index()
+    return df, df.groupby('REPORT_PERIOD').indices, history_index
+
+
+@lru_cache(maxsize=256)
 def format_period(period: int) -> str:
     """Format period number to readable string."""
     year = period // 100
@@ -515,7 +601,8 @@ def format_period(period: int) -> str:
     return f"{months[month]} {year}"
 
 
-def render_data_table(df, selected_period, all_df, dataset_type="pension"):
+@st.fragment
+def render_data_table(df, selected_period, all_df, history_index, dataset_type="pension"):
     """Render the main data table tab."""
     dataset_name = DATASETS[dataset_type]["name"]
     
@@ -545,7 +632,10 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
     with col_title:
         st.subheader(f"📋 {dataset_name} - {format_period(selected_period)}")
     with col_download:
-        csv = display_df.to_csv(index=False, encoding='utf-8-sig')
+        # Encode straight into a bytes buffer (no intermediate str copy)
+        buf = io.BytesIO()
+        display_df.to_csv(buf, index=False, encoding='utf-8-sig')
+        csv = buf.getvalue()
         st.download_button(
             label="📥 CSV",
             data=csv,
@@ -586,7 +676,11 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
     grid_options = gb.build()
     
     # Display AgGrid table - key includes data hash to refresh on filter changes
-    data_hash = hash(tuple(display_df['Fund ID'].tolist())) if len(display_df) > 0 else 0
+    if len(display_df) > 0:
+        id_hashes = pd.util.hash_pandas_object(display_df['Fund ID'], index=False).to_numpy()
+        data_hash = hashlib.blake2b(id_hashes.tobytes(), digest_size=8).hexdigest()
+    else:
+        data_hash = 0
     grid_response = AgGrid(
         display_df,
         gridOptions=grid_options,
@@ -623,29 +717,29 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
     fund_name_to_id = df.set_index('FUND_NAME')['FUND_ID'].to_dict()
     top5_fund_ids = [fund_name_to_id.get(name) for name in top5_fund_names if name in fund_name_to_id]
     
-    # Get historical data for these funds
-    historical_df = all_df[all_df['FUND_ID'].isin(top5_fund_ids)].copy()
-    
-    # Set FUND_NAME as categorical with order matching table
-    historical_df['FUND_NAME'] = pd.Categorical(
-        historical_df['FUND_NAME'], 
-        categories=top5_fund_names, 
-        ordered=True
-    )
-    
-    # Filter to show data up to the selected report period
+    # Show data up to the selected report period, limited to the chosen range
     selected_date = pd.to_datetime(str(selected_period), format='%Y%m')
-    historical_df = historical_df[historical_df['REPORT_DATE'] <= selected_date]
+    min_date = selected_date - pd.DateOffset(months=months_range) if months_range > 0 else None
     
-    # Filter by time range (months back from selected period)
-    if months_range > 0 and len(historical_df) > 0:
-        min_date = selected_date - pd.DateOffset(months=months_range)
-        historical_df = historical_df[historical_df['REPORT_DATE'] >= min_date]
+    # Get historical data for these funds via a sorted-index slice
+    if history_index.empty:
+        historical_df = all_df.iloc[0:0].copy()
+    else:
+        known_ids = history_index.index.levels[0]
+        lookup_ids = [fid for fid in top5_fund_ids if fid in known_ids]
+        positions = history_index.loc[(lookup_ids, slice(min_date, selected_date))].to_numpy()
+        historical_df = all_df.iloc[positions].reset_index(drop=True)
+    
+    # Set FUND_NAME as categorical with order matching table
+    fund_order = pd.CategoricalDtype(categories=top5_fund_names, ordered=True)
+    historical_df['FUND_NAME'] = historical_df['FUND_NAME'].astype(fund_order)
     
     if len(historical_df) > 0:
+        # Month ticks for the x-axis (computed once, reused by the layout)
+        tickvals = np.sort(historical_df['REPORT_DATE'].unique())
+        
         # Find the original column name for the sort column
-        reverse_labels = {v: k for k, v in COLUMN_LABELS.items()}
-        original_col = reverse_labels.get(sort_column, 'MONTHLY_YIELD')
+        original_col = REVERSE_COLUMN_LABELS.get(sort_column, 'MONTHLY_YIELD')
         
         # Check if the column has data for time series
         if original_col in historical_df.columns and historical_df[original_col].notna().any():
@@ -657,7 +751,6 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
             chart_label = 'Monthly Yield (%)'
         
         # Create short unique fund names for hover
-        historical_df = historical_df.copy()
         # Filter out NaN/None values from fund names
         unique_funds = [f for f in historical_df['FUND_NAME'].unique().tolist() if isinstance(f, str)]
         
@@ -707,11 +800,15 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
             return result if len(result) <= 25 else result[:22] + '..'
         
         short_name_map = {name: get_short_unique_name(name, unique_funds) for name in unique_funds}
-        historical_df['SHORT_NAME'] = historical_df['FUND_NAME'].map(short_name_map)
+        
+        # Only hand Plotly the columns the chart and hover actually use
+        plot_df = historical_df[['REPORT_DATE', 'FUND_NAME', chart_col]].assign(
+            SHORT_NAME=historical_df['FUND_NAME'].map(short_name_map)
+        ).sort_values(['FUND_NAME', 'REPORT_DATE'])
         
         # Dynamic chart showing the sorted column over time
         fig = px.line(
-            historical_df.sort_values(['FUND_NAME', 'REPORT_DATE']),
+            plot_df,
             x='REPORT_DATE',
             y=chart_col,
             color='FUND_NAME',
@@ -743,7 +840,7 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
             xaxis=dict(
                 tickformat='%Y/%m',
                 tickmode='array',
-                tickvals=historical_df['REPORT_DATE'].unique(),
+                tickvals=tickvals,
                 tickangle=-45,
                 showticklabels=True,
                 showgrid=True,
@@ -767,11 +864,89 @@ def render_data_table(df, selected_period, all_df, dataset_type="pension"):
         st.info("No historical data available for the selected funds.")
 
 
-def apply_chart_style(fig, height=400, show_legend=True, is_time_series=False, historical_df=None):
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: positions of n_out points that keep the line's shape."""
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+    
+    return selected
+
+
+def downsample_series(df, x_col, y_col, group_col=None, n_out=MAX_CHART_POINTS):
+    """Reduce each line (one per group_col value) to at most n_out points. df must be sorted by x."""
+    if len(df) <= n_out:
+        return df
+    
+    # Row positions of each line, in frame order
+    if group_col:
+        groups = df.groupby(group_col, sort=False, observed=True, dropna=False).indices.values()
+    else:
+        groups = [np.arange(len(df))]
+    
+    x_all = df[x_col].to_numpy()
+    if np.issubdtype(x_all.dtype, np.datetime64):
+        x_all = x_all.astype('datetime64[ns]').astype(np.int64)
+    y_all = df[y_col].to_numpy()
+    
+    keep = [
+        pos if len(pos) <= n_out else pos[lttb_indices(x_all[pos], y_all[pos], n_out)]
+        for pos in groups
+    ]
+    return df.iloc[np.sort(np.concatenate(keep))]
+
+
+def fund_line_figure(plot_df, y_col, title, y_label, hovertemplate):
+    """Line chart with one trace per FUND_NAME; plot_df must be sorted by fund then date."""
+    fig = go.Figure()
+    fund_rows = plot_df.groupby('FUND_NAME', observed=True).indices
+    for i, (fund_name, idx) in enumerate(fund_rows.items()):
+        fund = plot_df.iloc[idx]
+        fig.add_scatter(
+            x=fund['REPORT_DATE'],
+            y=fund[y_col],
+            customdata=fund[['SHORT_NAME']],
+            name=fund_name,
+            mode='lines+markers',
+            line=dict(color=COLORS[i % len(COLORS)]),
+            hovertemplate=hovertemplate
+        )
+    fig.update_layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title=y_label,
+        legend_title_text='Fund'
+    )
+    return fig
+
+
+def apply_chart_style(fig, height=400, show_legend=True, is_time_series=False, historical_df=None, tickvals=None):
     """Apply consistent chart styling across all charts."""
     layout_opts = {
         'height': height,
         'hovermode': 'closest',
+        # Keep zoom/pan across reruns of the same chart
+        'uirevision': fig.layout.title.text or 'const',
         'yaxis': dict(
             showgrid=True,
             gridcolor='rgba(128,128,128,0.3)',
@@ -796,10 +971,12 @@ def apply_chart_style(fig, height=400, show_legend=True, is_time_series=False, h
         layout_opts['margin'] = dict(t=50, b=80, r=30, l=50)
     
     if is_time_series and historical_df is not None:
+        if tickvals is None and 'REPORT_DATE' in historical_df.columns:
+            tickvals = np.sort(historical_df['REPORT_DATE'].unique())
         layout_opts['xaxis'] = dict(
             tickformat='%Y/%m',
             tickmode='array',
-            tickvals=historical_df['REPORT_DATE'].unique() if 'REPORT_DATE' in historical_df.columns else None,
+            tickvals=tickvals,
             tickangle=-45,
             showticklabels=True,
             showgrid=True,
@@ -821,6 +998,15 @@ def render_charts(df):
     """Render the charts tab."""
     st.subheader("📊 Data Visualizations")
     
+    # Aggregates shared by several charts below
+    mean_yield = df['MONTHLY_YIELD'].mean()
+    class_stats = df.groupby('FUND_CLASSIFICATION', observed=True).agg({
+        'FUND_ID': 'count',
+        'TOTAL_ASSETS': 'sum',
+        'MONTHLY_YIELD': 'mean'
+    }).reset_index()
+    class_stats.columns = ['Classification', 'Count', 'Total Assets', 'Avg Yield']
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -893,8 +1079,8 @@ def render_charts(df):
             labels={'MONTHLY_YIELD': 'Monthly Yield (%)', 'count': 'Number of Funds'},
             color_discrete_sequence=['#2563eb']
         )
-        fig4.add_vline(x=df['MONTHLY_YIELD'].mean(), line_dash="dash", line_color="red",
-                       annotation_text=f"Mean: {df['MONTHLY_YIELD'].mean():.2f}%")
+        fig4.add_vline(x=mean_yield, line_dash="dash", line_color="red",
+                       annotation_text=f"Mean: {mean_yield:.2f}%")
         fig4 = apply_chart_style(fig4, height=400, show_legend=False)
         st.plotly_chart(fig4, use_container_width=True)
     
@@ -903,13 +1089,6 @@ def render_charts(df):
     col5, col6 = st.columns(2)
     
     with col5:
-        class_stats = df.groupby('FUND_CLASSIFICATION').agg({
-            'FUND_ID': 'count',
-            'TOTAL_ASSETS': 'sum',
-            'MONTHLY_YIELD': 'mean'
-        }).reset_index()
-        class_stats.columns = ['Classification', 'Count', 'Total Assets', 'Avg Yield']
-        
         fig5 = px.pie(
             class_stats,
             values='Total Assets',
@@ -935,6 +1114,7 @@ def render_charts(df):
         st.plotly_chart(fig6, use_container_width=True)
 
 
+@st.fragment
 def render_comparison(df, all_df):
     """Render the fund comparison tab."""
     st.subheader("⚖️ Compare Funds")
@@ -979,16 +1159,18 @@ def render_comparison(df, all_df):
     
     comparison_data = {'Metric': [m[1] for m in metrics]}
     
-    for fund_name in selected_funds:
-        fund_id = fund_dict[fund_name]
-        fund_row = compare_df[compare_df['FUND_ID'] == fund_id].iloc[0] if len(compare_df[compare_df['FUND_ID'] == fund_id]) > 0 else None
-        
-        values = []
-        for col, label, fmt in metrics:
-            if fund_row is not None and pd.notna(fund_row[col]):
-                values.append(f"{fund_row[col]:{fmt}}")
-            else:
-                values.append("N/A")
+    # One indexed lookup (first row per fund) instead of a mask per fund
+    cols = [m[0] for m in metrics]
+    fmts = [m[2] for m in metrics]
+    lookup = compare_df.drop_duplicates('FUND_ID').set_index('FUND_ID')[cols].reindex(selected_fund_ids)
+    
+    # Metrics are rows, so each fund column mixes units; format per metric
+    # (thousands separators for assets) rather than with one column format
+    for fund_name, fund_values in zip(selected_funds, lookup.itertuples(index=False, name=None)):
+        values = [
+            f"{value:{fmt}}" if pd.notna(value) else "N/A"
+            for value, fmt in zip(fund_values, fmts)
+        ]
         
         # Truncate fund name for column header
         short_name = fund_name[:25] + "..." if len(fund_name) > 25 else fund_name
@@ -1000,51 +1182,41 @@ def render_comparison(df, all_df):
     # Historical comparison chart
     st.markdown("### 📈 Historical Performance")
     
-    historical_df = all_df[all_df['FUND_ID'].isin(selected_fund_ids)].copy()
+    # Selected funds' history with short names for hover (no full copy)
+    historical_df = all_df.loc[all_df['FUND_ID'].isin(selected_fund_ids)].assign(
+        SHORT_NAME=lambda d: d['FUND_NAME'].str.split(n=1).str[0].fillna(d['FUND_NAME'].str[:15])
+    )
     
     if len(historical_df) > 0:
-        # Create short names for hover
-        unique_funds = [f for f in historical_df['FUND_NAME'].unique().tolist() if isinstance(f, str)]
-        short_name_map = {name: name.split()[0] if len(name.split()) > 0 else name[:15] for name in unique_funds}
-        historical_df['SHORT_NAME'] = historical_df['FUND_NAME'].map(short_name_map)
+        # Shared x-axis ticks for both time-series charts
+        tickvals = np.sort(historical_df['REPORT_DATE'].unique())
         
-        fig = px.line(
-            historical_df.sort_values(['FUND_NAME', 'REPORT_DATE']),
-            x='REPORT_DATE',
-            y='MONTHLY_YIELD',
-            color='FUND_NAME',
-            custom_data=['SHORT_NAME'],
+        sorted_df = historical_df.sort_values(['FUND_NAME', 'REPORT_DATE'])
+        
+        fig = fund_line_figure(
+            downsample_series(sorted_df, 'REPORT_DATE', 'MONTHLY_YIELD', 'FUND_NAME'),
+            'MONTHLY_YIELD',
             title='Monthly Yield Over Time',
-            labels={'REPORT_DATE': 'Date', 'MONTHLY_YIELD': 'Monthly Yield (%)', 'FUND_NAME': 'Fund'},
-            color_discrete_sequence=COLORS
-        )
-        fig.update_traces(
-            mode='lines+markers',
+            y_label='Monthly Yield (%)',
             hovertemplate='<b>%{customdata[0]}</b><br>%{x|%Y/%m}: %{y:.2f}%<extra></extra>'
         )
-        fig = apply_chart_style(fig, height=400, is_time_series=True, historical_df=historical_df)
+        fig = apply_chart_style(fig, height=400, is_time_series=True, historical_df=historical_df, tickvals=tickvals)
         fig.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5)
         st.plotly_chart(fig, use_container_width=True)
         
         # Assets over time
-        fig2 = px.line(
-            historical_df.sort_values(['FUND_NAME', 'REPORT_DATE']),
-            x='REPORT_DATE',
-            y='TOTAL_ASSETS',
-            color='FUND_NAME',
-            custom_data=['SHORT_NAME'],
+        fig2 = fund_line_figure(
+            downsample_series(sorted_df, 'REPORT_DATE', 'TOTAL_ASSETS', 'FUND_NAME'),
+            'TOTAL_ASSETS',
             title='Total Assets Over Time',
-            labels={'REPORT_DATE': 'Date', 'TOTAL_ASSETS': 'Total Assets (M)', 'FUND_NAME': 'Fund'},
-            color_discrete_sequence=COLORS
-        )
-        fig2.update_traces(
-            mode='lines+markers',
+            y_label='Total Assets (M)',
             hovertemplate='<b>%{customdata[0]}</b><br>%{x|%Y/%m}: %{y:,.0f}M<extra></extra>'
         )
-        fig2 = apply_chart_style(fig2, height=400, is_time_series=True, historical_df=historical_df)
+        fig2 = apply_chart_style(fig2, height=400, is_time_series=True, historical_df=historical_df, tickvals=tickvals)
         st.plotly_chart(fig2, use_container_width=True)
 
 
+@st.fragment
 def render_historical(all_df):
     """Render the historical trends tab."""
     st.subheader("📈 Historical Trends")
@@ -1088,6 +1260,12 @@ def render_historical(all_df):
         else:
             st.metric("Asset Growth", "N/A")
     
+    # Per-metric line series, downsampled for very long histories
+    series = {
+        col: downsample_series(fund_history, 'REPORT_DATE', col)
+        for col in ['MONTHLY_YIELD', 'TOTAL_ASSETS', 'YEAR_TO_DATE_YIELD', 'AVG_ANNUAL_MANAGEMENT_FEE']
+    }
+    
     # Create subplots
     fig = make_subplots(
         rows=2, cols=2,
@@ -1099,7 +1277,7 @@ def render_historical(all_df):
     # Monthly Yield
     fig.add_trace(
         go.Scatter(
-            x=fund_history['REPORT_DATE'], y=fund_history['MONTHLY_YIELD'],
+            x=series['MONTHLY_YIELD']['REPORT_DATE'], y=series['MONTHLY_YIELD']['MONTHLY_YIELD'],
             mode='lines+markers', name='Monthly Yield', line=dict(color=COLORS[0]),
             hovertemplate='%{x|%Y/%m}: %{y:.2f}%<extra></extra>'
         ),
@@ -1110,7 +1288,7 @@ def render_historical(all_df):
     # Total Assets
     fig.add_trace(
         go.Scatter(
-            x=fund_history['REPORT_DATE'], y=fund_history['TOTAL_ASSETS'],
+            x=series['TOTAL_ASSETS']['REPORT_DATE'], y=series['TOTAL_ASSETS']['TOTAL_ASSETS'],
             mode='lines+markers', name='Total Assets', line=dict(color=COLORS[1]),
             fill='tozeroy', fillcolor='rgba(124, 58, 237, 0.1)',
             hovertemplate='%{x|%Y/%m}: %{y:,.0f}M<extra></extra>'
@@ -1121,7 +1299,7 @@ def render_historical(all_df):
     # YTD Yield
     fig.add_trace(
         go.Scatter(
-            x=fund_history['REPORT_DATE'], y=fund_history['YEAR_TO_DATE_YIELD'],
+            x=series['YEAR_TO_DATE_YIELD']['REPORT_DATE'], y=series['YEAR_TO_DATE_YIELD']['YEAR_TO_DATE_YIELD'],
             mode='lines+markers', name='YTD Yield', line=dict(color=COLORS[2]),
             hovertemplate='%{x|%Y/%m}: %{y:.2f}%<extra></extra>'
         ),
@@ -1132,7 +1310,7 @@ def render_historical(all_df):
     # Management Fee
     fig.add_trace(
         go.Scatter(
-            x=fund_history['REPORT_DATE'], y=fund_history['AVG_ANNUAL_MANAGEMENT_FEE'],
+            x=series['AVG_ANNUAL_MANAGEMENT_FEE']['REPORT_DATE'], y=series['AVG_ANNUAL_MANAGEMENT_FEE']['AVG_ANNUAL_MANAGEMENT_FEE'],
             mode='lines+markers', name='Mgmt Fee', line=dict(color=COLORS[3]),
             hovertemplate='%{x|%Y/%m}: %{y:.2f}%<extra></extra>'
         ),
@@ -1143,7 +1321,8 @@ def render_historical(all_df):
         height=700, 
         showlegend=False, 
         title_text=f"📊 {selected_fund}",
-        hovermode='closest'
+        hovermode='closest',
+        uirevision=selected_fund
     )
     fig.update_xaxes(
         tickformat='%Y/%m',
@@ -1163,35 +1342,21 @@ def render_historical(all_df):
     # Statistics table
     st.markdown("### 📊 Statistics Summary")
     
-    stats_data = {
-        'Metric': ['Monthly Yield (%)', 'Total Assets (M)', 'Management Fee (%)', 'Stock Exposure (%)'],
-        'Min': [
-            f"{fund_history['MONTHLY_YIELD'].min():.2f}",
-            f"{fund_history['TOTAL_ASSETS'].min():.2f}",
-            f"{fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].min():.2f}" if fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].notna().any() else "N/A",
-            f"{fund_history['STOCK_MARKET_EXPOSURE'].min():.2f}" if fund_history['STOCK_MARKET_EXPOSURE'].notna().any() else "N/A",
-        ],
-        'Max': [
-            f"{fund_history['MONTHLY_YIELD'].max():.2f}",
-            f"{fund_history['TOTAL_ASSETS'].max():.2f}",
-            f"{fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].max():.2f}" if fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].notna().any() else "N/A",
-            f"{fund_history['STOCK_MARKET_EXPOSURE'].max():.2f}" if fund_history['STOCK_MARKET_EXPOSURE'].notna().any() else "N/A",
-        ],
-        'Average': [
-            f"{fund_history['MONTHLY_YIELD'].mean():.2f}",
-            f"{fund_history['TOTAL_ASSETS'].mean():.2f}",
-            f"{fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].mean():.2f}" if fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].notna().any() else "N/A",
-            f"{fund_history['STOCK_MARKET_EXPOSURE'].mean():.2f}" if fund_history['STOCK_MARKET_EXPOSURE'].notna().any() else "N/A",
-        ],
-        'Std Dev': [
-            f"{fund_history['MONTHLY_YIELD'].std():.2f}",
-            f"{fund_history['TOTAL_ASSETS'].std():.2f}",
-            f"{fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].std():.2f}" if fund_history['AVG_ANNUAL_MANAGEMENT_FEE'].notna().any() else "N/A",
-            f"{fund_history['STOCK_MARKET_EXPOSURE'].std():.2f}" if fund_history['STOCK_MARKET_EXPOSURE'].notna().any() else "N/A",
-        ],
-    }
-    
-    st.dataframe(pd.DataFrame(stats_data), use_container_width=True, hide_index=True)
+    # One aggregation pass; numbers are formatted by the frontend
+    stat_cols = ['MONTHLY_YIELD', 'TOTAL_ASSETS', 'AVG_ANNUAL_MANAGEMENT_FEE', 'STOCK_MARKET_EXPOSURE']
+    stats_table = fund_history[stat_cols].agg(['min', 'max', 'mean', 'std']).T
+    stats_table.columns = ['Min', 'Max', 'Average', 'Std Dev']
+    stats_table.insert(0, 'Metric', ['Monthly Yield (%)', 'Total Assets (M)', 'Management Fee (%)', 'Stock Exposure (%)'])
+    
+    st.dataframe(
+        stats_table,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            col: st.column_config.NumberColumn(format="%.2f")
+            for col in ['Min', 'Max', 'Average', 'Std Dev']
+        }
+    )
 
 
 def main():
@@ -1256,14 +1421,14 @@ def main():
     
     # Fetch data
     with st.spinner(f"Fetching {dataset_name} data from data.gov.il..."):
-        all_df = fetch_all_data(dataset_type)
+        all_df, period_index, history_index = fetch_data_with_period_index(dataset_type)
     
     if all_df.empty:
         st.error("Failed to fetch data. Please try again later.")
         return
     
     # Get available periods
-    periods = sorted(all_df['REPORT_PERIOD'].unique(), reverse=True)
+    periods = sorted(period_index, reverse=True)
     latest_period = periods[0]
     
     st.sidebar.header("🔧 Filters")
@@ -1276,8 +1441,8 @@ def main():
         format_func=format_period
     )
     
-    # Filter data by selected period
-    filtered_df = all_df[all_df['REPORT_PERIOD'] == selected_period].copy()
+    # Filter data by selected period (precomputed row positions)
+    filtered_df = all_df.iloc[period_index[selected_period]]
     
     # Apply sub-dataset filter if selected
     if sub_filters_config and selected_sub_filters:
@@ -1299,8 +1464,10 @@ def main():
         options=classifications
     )
     
+    # Remaining filters are collected into one mask and applied once
+    mask = pd.Series(True, index=filtered_df.index)
     if selected_classification != 'All':
-        filtered_df = filtered_df[filtered_df['FUND_CLASSIFICATION'] == selected_classification]
+        mask &= filtered_df['FUND_CLASSIFICATION'].eq(selected_classification)
     
     # Managing corporation filter (only for datasets that have this column)
     corp_col = None
@@ -1310,26 +1477,27 @@ def main():
         corp_col = 'PARENT_COMPANY_NAME'
     
     if corp_col:
-        corporations = ['All'] + sorted(filtered_df[corp_col].dropna().unique().tolist())
+        corporations = ['All'] + sorted(filtered_df.loc[mask, corp_col].dropna().unique().tolist())
         selected_corp = st.sidebar.selectbox(
             "🏢 Company",
             options=corporations
         )
         
         if selected_corp != 'All':
-            filtered_df = filtered_df[filtered_df[corp_col] == selected_corp]
+            mask &= filtered_df[corp_col].eq(selected_corp)
     
-    # Minimum assets filter
+    # Minimum assets filter (bound precomputed per period)
+    max_assets = get_assets_bounds(dataset_type).get(selected_period)
     min_assets = st.sidebar.slider(
         "💰 Minimum Total Assets (M)",
         min_value=0.0,
-        max_value=float(filtered_df['TOTAL_ASSETS'].max()) if len(filtered_df) > 0 else 100.0,
+        max_value=float(max_assets) if max_assets else 100.0,
         value=0.0,
         step=10.0
     )
     
     if min_assets > 0:
-        filtered_df = filtered_df[filtered_df['TOTAL_ASSETS'] >= min_assets]
+        mask &= filtered_df['TOTAL_ASSETS'] >= min_assets
     
     # Stock Market Exposure filter (now in percentages 0-100%)
     st.sidebar.markdown("---")
@@ -1342,10 +1510,7 @@ def main():
         value=(0.0, 100.0),
         step=1.0
     )
-    filtered_df = filtered_df[
-        (filtered_df['STOCK_MARKET_EXPOSURE'] >= stock_exposure_range[0]) & 
-        (filtered_df['STOCK_MARKET_EXPOSURE'] <= stock_exposure_range[1])
-    ]
+    mask &= filtered_df['STOCK_MARKET_EXPOSURE'].between(*stock_exposure_range)
     
     # Foreign Exposure filter (now in percentages 0-100%)
     foreign_exposure_range = st.sidebar.slider(
@@ -1355,10 +1520,7 @@ def main():
         value=(0.0, 100.0),
         step=1.0
     )
-    filtered_df = filtered_df[
-        (filtered_df['FOREIGN_EXPOSURE'] >= foreign_exposure_range[0]) & 
-        (filtered_df['FOREIGN_EXPOSURE'] <= foreign_exposure_range[1])
-    ]
+    mask &= filtered_df['FOREIGN_EXPOSURE'].between(*foreign_exposure_range)
     
     # Foreign Currency Exposure filter (now in percentages 0-100%)
     currency_exposure_range = st.sidebar.slider(
@@ -1368,15 +1530,14 @@ def main():
         value=(0.0, 100.0),
         step=1.0
     )
-    filtered_df = filtered_df[
-        (filtered_df['FOREIGN_CURRENCY_EXPOSURE'] >= currency_exposure_range[0]) & 
-        (filtered_df['FOREIGN_CURRENCY_EXPOSURE'] <= currency_exposure_range[1])
-    ]
+    mask &= filtered_df['FOREIGN_CURRENCY_EXPOSURE'].between(*currency_exposure_range)
     
     # Fund name search
     search_term = st.sidebar.text_input("🔍 Search Fund Name", "")
     if search_term:
-        filtered_df = filtered_df[filtered_df['FUND_NAME'].str.contains(search_term, case=False, na=False)]
+        mask &= filtered_df['FUND_NAME_LC'].str.contains(search_term.lower(), regex=False, na=False)
+    
+    filtered_df = filtered_df.loc[mask]
     
     # Cache info and Refresh button in sidebar
     cache_age = get_cache_age(dataset_type)
@@ -1385,6 +1546,9 @@ def main():
     
     if st.sidebar.button("🔄 Refresh Data"):
         st.cache_data.clear()
+        # Bypass the on-disk cache too, otherwise it is re-served until it ages out
+        with st.spinner(f"Fetching {dataset_name} data from data.gov.il..."):
+            fetch_all_data(dataset_type, force_refresh=True)
         st.rerun()
     
     # Tabs
@@ -1400,7 +1564,7 @@ def main():
     ])
     
     with tab1:
-        render_data_table(filtered_df, selected_period, all_df, dataset_type)
+        render_data_table(filtered_df, selected_period, all_df, history_index, dataset_type)
     
     with tab2:
         render_charts(filtered_df)
@@ -6,16 +6,44 @@ Source: https://data.gov.il/he/datasets/cma/pensia-net/a66926f3-e396-4984-a4db-7
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 
+try:
+    import orjson
+except ImportError:  # Optional fast JSON parser
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional columnar builder (ships with streamlit)
+    pa = None
+
 
 class PensiaDataFetcher:
     """Client for fetching pension data from data.gov.il CKAN API."""
     
     BASE_URL = "https://data.gov.il/api/3/action"
     RESOURCE_ID = "a66926f3-e396-4984-a4db-75486751c2f7"
+    MAX_WORKERS = 8
+    TIMEOUT = 30
+    
+    # Low-cardinality text columns stored as pandas categoricals
+    CATEGORICAL_COLUMNS = [
+        "FUND_NAME", "FUND_CLASSIFICATION", "MANAGING_CORPORATION", "PARENT_COMPANY_NAME"
+    ]
+    
+    # Measure columns coerced to numbers (CKAN may return them as text)
+    NUMERIC_COLUMNS = [
+        "TOTAL_ASSETS", "MONTHLY_YIELD", "YEAR_TO_DATE_YIELD",
+        "AVG_ANNUAL_YIELD_TRAILING_3YRS", "AVG_ANNUAL_YIELD_TRAILING_5YRS",
+        "AVG_ANNUAL_MANAGEMENT_FEE", "AVG_DEPOSIT_FEE", "STANDARD_DEVIATION", "SHARPE_RATIO",
+        "STOCK_MARKET_EXPOSURE", "FOREIGN_EXPOSURE", "FOREIGN_CURRENCY_EXPOSURE"
+    ]
     
     def __init__(self, resource_id: Optional[str] = None):
         """
@@ -25,11 +53,23 @@ class PensiaDataFetcher:
             resource_id: Override the default resource ID if needed
         """
         self.resource_id = resource_id or self.RESOURCE_ID
+        
+        # One pooled session so concurrent batches reuse TCP/TLS connections,
+        # retrying transient CKAN failures with backoff
+        self._session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(
+            pool_connections=self.MAX_WORKERS,
+            pool_maxsize=self.MAX_WORKERS,
+            max_retries=retry
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
     
     def get_resource_info(self) -> dict:
         """Get metadata about the resource."""
         url = f"{self.BASE_URL}/resource_show"
-        response = requests.get(url, params={"id": self.resource_id})
+        response = self._session.get(url, params={"id": self.resource_id}, timeout=self.TIMEOUT)
         response.raise_for_status()
         return response.json()
     
@@ -69,8 +109,15 @@ class PensiaDataFetcher:
         if search:
             params["q"] = search
             
-        response = requests.get(url, params=params)
+        response = self._session.get(url, params=params, timeout=self.TIMEOUT)
         response.raise_for_status()
+        return self._parse_json(response)
+    
+    @staticmethod
+    def _parse_json(response: requests.Response) -> dict:
+        """Decode a JSON response body, using orjson when it is installed."""
+        if orjson is not None:
+            return orjson.loads(response.content)
         return response.json()
     
     def fetch_all_data(self, batch_size: int = 5000) -> list[dict]:
@@ -84,7 +131,6 @@ class PensiaDataFetcher:
             List of all records
         """
         all_records = []
-        offset = 0
         
         # First request to get total count
         result = self.fetch_data(limit=batch_size, offset=0)
@@ -98,17 +144,28 @@ class PensiaDataFetcher:
         print(f"Total records: {total}")
         print(f"Fetched: {len(all_records)}", end="")
         
-        # Fetch remaining batches
-        offset = batch_size
-        while offset < total:
-            result = self.fetch_data(limit=batch_size, offset=offset)
-            
-            if not result.get("success"):
-                raise Exception(f"API Error: {result.get('error')}")
-            
-            all_records.extend(result["result"]["records"])
-            offset += batch_size
-            print(f"\rFetched: {len(all_records)}", end="")
+        # Fetch remaining batches concurrently (offsets are independent)
+        offsets = range(batch_size, total, batch_size)
+        batches = {}
+        fetched = len(all_records)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(self.fetch_data, limit=batch_size, offset=o): o
+                for o in offsets
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                
+                if not result.get("success"):
+                    raise Exception(f"API Error: {result.get('error')}")
+                
+                batches[futures[future]] = result["result"]["records"]
+                fetched += len(batches[futures[future]])
+                print(f"\rFetched: {fetched}", end="")
+        
+        # Keep records in offset order
+        for o in offsets:
+            all_records.extend(batches[o])
         
         print(f"\rFetched: {len(all_records)} records (complete)")
         return all_records
@@ -124,9 +181,9 @@ class PensiaDataFetcher:
             API response as dict
         """
         url = f"{self.BASE_URL}/datastore_search_sql"
-        response = requests.get(url, params={"sql": sql_query})
+        response = self._session.get(url, params={"sql": sql_query}, timeout=self.TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        return self._parse_json(response)
     
     def to_dataframe(self, records: Optional[list[dict]] = None) -> pd.DataFrame:
         """
@@ -141,14 +198,33 @@ class PensiaDataFetcher:
         if records is None:
             records = self.fetch_all_data()
         
-        df = pd.DataFrame(records)
+        df = self._records_to_frame(records)
         
         # Remove internal CKAN column if present
         if "_id" in df.columns:
             df = df.drop(columns=["_id"])
         
+        # Compact dtypes: categorical codes for labels, real numbers for measures
+        numeric_cols = [c for c in self.NUMERIC_COLUMNS if c in df.columns]
+        if numeric_cols:
+            df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
+        for col in self.CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+        
         return df
     
+    @staticmethod
+    def _records_to_frame(records: list[dict]) -> pd.DataFrame:
+        """Build a DataFrame from records, via Arrow's columnar builder when available."""
+        if pa is not None and records:
+            try:
+                return pa.Table.from_pylist(records).to_pandas()
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed-type column; let pandas infer object dtype
+                pass
+        return pd.DataFrame(records)
+    
     def get_column_names(self) -> list[str]:
         """Get the column names of the dataset."""
         result = self.fetch_data(limit=1)
@@ -0,0 +1,77 @@
+"""
+Shared GitHub helpers for the release and update scripts.
+"""
+
+import os
+from pathlib import Path
+
+import requests
+
+# Configuration
+GITHUB_REPO = "moranlevy420/birmanet"
+GITHUB_API = "https://api.github.com"
+CONFIG_FILE = ".github_token"
+
+# One keep-alive session for every GitHub call in this run
+SESSION = requests.Session()
+
+
+def get_token():
+    """Get GitHub token from config file or environment."""
+    # Check environment variable first
+    token = os.environ.get("GITHUB_TOKEN")
+    if token:
+        return token
+    
+    # Check config file
+    config_path = Path(__file__).parent.parent / CONFIG_FILE
+    if config_path.exists():
+        with open(config_path, "r") as f:
+            token = f.read().strip()
+            if token:
+                return token
+    
+    return None
+
+
+def save_token(token: str):
+    """Save token to config file."""
+    config_path = Path(__file__).parent.parent / CONFIG_FILE
+    with open(config_path, "w") as f:
+        f.write(token)
+    print(f"  Token saved to {CONFIG_FILE}")
+
+
+def api_headers(token: str = None) -> dict:
+    """Headers for GitHub API requests."""
+    headers = {
+        "Accept": "application/vnd.github.v3+json",
+        "User-Agent": "FindBetter-Updater"
+    }
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+
+def report_http_error(response: requests.Response):
+    """Print a friendly message for a GitHub API error."""
+    if response.status_code == 401:
+        print("  [ERROR] Invalid or expired token")
+    elif response.status_code == 404:
+        print("  [ERROR] Repository not found or no access")
+    else:
+        print(f"  [ERROR] HTTP {response.status_code}: {response.reason}")
+
+
+def api_request(url: str, token: str = None, session: requests.Session = None):
+    """Make authenticated API request."""
+    session = session or SESSION
+    try:
+        response = session.get(url, headers=api_headers(token), timeout=30)
+        if not response.ok:
+            report_http_error(response)
+            return None
+        return response.json()
+    except Exception as e:
+        print(f"  [ERROR] {e}")
+        return None
@@ -13,27 +13,29 @@ This will:
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
+import shutil
+import fnmatch
+import tempfile
+import zipfile
+import mimetypes
 import subprocess
 from pathlib import Path
 
-GITHUB_REPO = "moranlevy420/birmanet"
-GITHUB_API = "https://api.github.com"
+import requests
+
+from _github import GITHUB_REPO, GITHUB_API, SESSION, get_token as saved_token, save_token
+
+# Already-compressed formats that are stored rather than deflated again
+PRECOMPRESSED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".gz", ".zip", ".whl", ".woff", ".woff2"}
 
 
 def get_token():
     """Get GitHub token."""
-    # Check environment
-    token = os.environ.get("GITHUB_TOKEN")
+    # Check environment and token file
+    token = saved_token()
     if token:
         return token
     
-    # Check file
-    token_file = Path(__file__).parent.parent / ".github_token"
-    if token_file.exists():
-        return token_file.read_text().strip()
-    
     # Ask user
     print("GitHub token not found.")
     print("Go to https://github.com/settings/tokens to create one.")
@@ -42,12 +44,51 @@ def get_token():
     token = input("Paste token: ").strip()
     
     if token:
-        token_file.write_text(token)
-        print("Token saved.")
+        save_token(token)
     
     return token
 
 
+def collect_files(roots: list, excludes: list):
+    """Yield files under the given roots, pruning excluded names."""
+    def excluded(name):
+        return any(fnmatch.fnmatch(name, pattern) for pattern in excludes)
+    
+    for root in roots:
+        root = root.rstrip("/")
+        if os.path.isfile(root):
+            if not excluded(os.path.basename(root)):
+                yield root
+            continue
+        
+        for dirpath, dirnames, filenames in os.walk(root):
+            # Prune in place so os.walk never descends into excluded dirs
+            dirnames[:] = [d for d in dirnames if not excluded(d)]
+            for name in filenames:
+                if not excluded(name):
+                    yield os.path.join(dirpath, name)
+
+
+def create_zip_python(zip_name: str, files: list) -> str:
+    """Create the release zip with zipfile, storing pre-compressed files as-is."""
+    print(f"Creating {zip_name}...")
+    try:
+        with zipfile.ZipFile(zip_name, "w", compression=zipfile.ZIP_DEFLATED,
+                             compresslevel=1, allowZip64=True) as zf:
+            for name in files:
+                # Deflating already-compressed data only burns CPU
+                if Path(name).suffix.lower() in PRECOMPRESSED_SUFFIXES:
+                    zf.write(name, compress_type=zipfile.ZIP_STORED)
+                else:
+                    zf.write(name)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+    
+    print(f"[OK] Created {zip_name}")
+    return zip_name
+
+
 def create_zip(version: str) -> str:
     """Create release zip file."""
     zip_name = f"FindBetter_{version}.zip"
@@ -67,21 +108,39 @@ def create_zip(version: str) -> str:
         "utils/", "scripts/", "migrations/", "tests/"
     ]
     
-    # Exclusions
+    # Exclusions (matched against file and directory names)
     excludes = [
-        "*.pyc", "*__pycache__*", "*.db", ".git/*",
+        "*.pyc", "__pycache__", "*.db", "*.db-wal", "*.db-shm", ".git",
         ".github_token", "*.zip"
     ]
     
-    # Build zip command
-    cmd = ["zip", "-r", zip_name] + includes
-    for ex in excludes:
-        cmd.extend(["-x", ex])
+    # Hand the archiver an explicit file list so it never walks excluded trees
+    files = list(collect_files(includes, excludes))
+    
+    # No archiver on PATH (typical on Windows) - build it in Python
+    if not shutil.which("7z") and not shutil.which("zip"):
+        return create_zip_python(zip_name, files)
+    
+    with tempfile.NamedTemporaryFile("w", suffix=".lst", delete=False) as fp:
+        fp.writelines(name + "\n" for name in files)
+        manifest = fp.name
+    
+    # Prefer multi-threaded 7-Zip at a fast level, fall back to zip -1
+    if shutil.which("7z"):
+        cmd = ["7z", "a", "-tzip", "-mmt=on", "-mx=3", zip_name, f"@{manifest}"]
+        max_ok_code = 1  # 7z uses 1 for non-fatal warnings
+    else:
+        cmd = ["zip", "-1", "-q", zip_name, "-@"]
+        max_ok_code = 0
     
     print(f"Creating {zip_name}...")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        with open(manifest) as stdin:
+            result = subprocess.run(cmd, stdin=stdin, capture_output=True, text=True)
+    finally:
+        os.remove(manifest)
     
-    if result.returncode != 0:
+    if result.returncode > max_ok_code:
         print(f"Error: {result.stderr}")
         return None
     
@@ -93,13 +152,13 @@ def create_github_release(version: str, token: str) -> dict:
     """Create a GitHub release."""
     url = f"{GITHUB_API}/repos/{GITHUB_REPO}/releases"
     
-    data = json.dumps({
+    payload = {
         "tag_name": version,
         "name": f"Find Better {version}",
         "body": f"Release {version}\n\nDownload the zip file and run INSTALL_WINDOWS.bat",
         "draft": False,
         "prerelease": False
-    }).encode()
+    }
     
     headers = {
         "Authorization": f"token {token}",
@@ -107,46 +166,45 @@ def create_github_release(version: str, token: str) -> dict:
         "Content-Type": "application/json"
     }
     
-    req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    
     try:
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        print(f"Error creating release: {e.code} - {error_body}")
+        response = SESSION.post(url, data=json.dumps(payload), headers=headers, timeout=30)
+    except requests.RequestException as e:
+        print(f"Error creating release: {e}")
+        return None
+    
+    if not response.ok:
+        print(f"Error creating release: {response.status_code} - {response.text}")
         return None
+    return response.json()
 
 
 def upload_asset(upload_url: str, file_path: str, token: str) -> bool:
-    """Upload zip file to release."""
+    """Upload a file to the release."""
     # Clean URL (remove template part)
     upload_url = upload_url.split("{")[0]
     file_name = os.path.basename(file_path)
     
     url = f"{upload_url}?name={file_name}"
     
-    with open(file_path, "rb") as f:
-        data = f.read()
-    
     headers = {
         "Authorization": f"token {token}",
         "Accept": "application/vnd.github.v3+json",
-        "Content-Type": "application/zip",
-        "Content-Length": str(len(data))
+        "Content-Type": mimetypes.guess_type(file_name)[0] or "application/octet-stream"
     }
     
-    req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    
     try:
         print(f"Uploading {file_name}...")
-        with urllib.request.urlopen(req, timeout=120) as response:
-            result = json.loads(response.read().decode())
-            print(f"[OK] Uploaded: {result.get('browser_download_url', 'success')}")
-            return True
-    except urllib.error.HTTPError as e:
-        print(f"Error uploading: {e.code}")
-        return False
+        # Pass the open file so the body is streamed in blocks, not read into memory
+        with open(file_path, "rb") as f:
+            # Size comes from the open handle, so it always matches what is sent
+            headers["Content-Length"] = str(os.fstat(f.fileno()).st_size)
+            response = SESSION.post(url, data=f, headers=headers, timeout=120)
+        if not response.ok:
+            print(f"Error uploading: {response.status_code}")
+            return False
+        result = response.json()
+        print(f"[OK] Uploaded: {result.get('browser_download_url', 'success')}")
+        return True
     except Exception as e:
         print(f"Error: {e}")
         return False
@@ -190,13 +248,12 @@ def main():
     
     print(f"[OK] Created release: {release.get('html_url')}")
     
-    # Upload zip
+    # Upload the archive
     print()
     upload_url = release.get("upload_url")
     if upload_url:
-        success = upload_asset(upload_url, zip_file, token)
-        if not success:
-            print("Warning: Failed to upload zip file")
+        if not upload_asset(upload_url, zip_file, token):
+            print(f"Warning: Failed to upload {os.path.basename(zip_file)}")
     
     # Cleanup
     if os.path.exists(zip_file):
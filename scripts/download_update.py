@@ -9,68 +9,23 @@ Usage:
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
+import mmap
+import binascii
 import zipfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 
-# Configuration
-GITHUB_REPO = "moranlevy420/birmanet"
-GITHUB_API = "https://api.github.com"
-CONFIG_FILE = ".github_token"
-
+from _github import (
+    GITHUB_REPO, GITHUB_API, SESSION,
+    get_token, save_token, api_headers, report_http_error, api_request
+)
 
-def get_token():
-    """Get GitHub token from config file or environment."""
-    # Check environment variable first
-    token = os.environ.get("GITHUB_TOKEN")
-    if token:
-        return token
-    
-    # Check config file
-    config_path = Path(__file__).parent.parent / CONFIG_FILE
-    if config_path.exists():
-        with open(config_path, "r") as f:
-            token = f.read().strip()
-            if token:
-                return token
-    
-    return None
-
-
-def save_token(token: str):
-    """Save token to config file."""
-    config_path = Path(__file__).parent.parent / CONFIG_FILE
-    with open(config_path, "w") as f:
-        f.write(token)
-    print(f"  Token saved to {CONFIG_FILE}")
-
-
-def api_request(url: str, token: str = None):
-    """Make authenticated API request."""
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "User-Agent": "FindBetter-Updater"
-    }
-    if token:
-        headers["Authorization"] = f"token {token}"
-    
-    req = urllib.request.Request(url, headers=headers)
-    try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.HTTPError as e:
-        if e.code == 401:
-            print("  [ERROR] Invalid or expired token")
-        elif e.code == 404:
-            print("  [ERROR] Repository not found or no access")
-        else:
-            print(f"  [ERROR] HTTP {e.code}: {e.reason}")
-        return None
-    except Exception as e:
-        print(f"  [ERROR] {e}")
-        return None
+# Configuration
+RELEASE_CACHE_FILE = ".release_cache.json"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB reads per write when saving downloads
+MMAP_MIN_SIZE = 64 * 1024  # below this, mapping costs more than reading
+STAGE_WORKERS = 8  # entries checked/staged in parallel (CRC and zlib release the GIL)
 
 
 def download_file(url: str, dest: str, token: str = None):
@@ -82,11 +37,12 @@ def download_file(url: str, dest: str, token: str = None):
     if token:
         headers["Authorization"] = f"token {token}"
     
-    req = urllib.request.Request(url, headers=headers)
     try:
-        with urllib.request.urlopen(req, timeout=120) as response:
+        with SESSION.get(url, headers=headers, stream=True, timeout=120) as response:
+            response.raise_for_status()
             with open(dest, "wb") as f:
-                shutil.copyfileobj(response, f)
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
         return True
     except Exception as e:
         print(f"  [ERROR] Download failed: {e}")
@@ -94,9 +50,48 @@ def download_file(url: str, dest: str, token: str = None):
 
 
 def get_latest_release(token: str):
-    """Get latest release info from GitHub."""
+    """
+    Get latest release info from GitHub.
+    
+    Sends the ETag of the last response as If-None-Match, so an unchanged
+    release comes back as 304 Not Modified (no body, no rate-limit cost)
+    and is served from RELEASE_CACHE_FILE.
+    """
     url = f"{GITHUB_API}/repos/{GITHUB_REPO}/releases/latest"
-    return api_request(url, token)
+    cache_path = Path(__file__).parent.parent / RELEASE_CACHE_FILE
+    
+    cache = {}
+    if cache_path.exists():
+        try:
+            with open(cache_path, "r") as f:
+                cache = json.load(f)
+        except Exception:
+            cache = {}
+    
+    headers = api_headers(token)
+    if cache.get("etag") and cache.get("release"):
+        headers["If-None-Match"] = cache["etag"]
+    
+    try:
+        response = SESSION.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and cache.get("release"):
+            # Unchanged since the cached response
+            return cache["release"]
+        if not response.ok:
+            report_http_error(response)
+            return None
+        release = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            try:
+                with open(cache_path, "w") as f:
+                    json.dump({"etag": etag, "release": release}, f)
+            except OSError:
+                pass
+        return release
+    except Exception as e:
+        print(f"  [ERROR] {e}")
+        return None
 
 
 def download_release_asset(asset: dict, token: str):
@@ -114,43 +109,107 @@ def download_release_asset(asset: dict, token: str):
     if token:
         headers["Authorization"] = f"token {token}"
     
-    req = urllib.request.Request(url, headers=headers)
     try:
-        with urllib.request.urlopen(req, timeout=120) as response:
+        with SESSION.get(url, headers=headers, stream=True, timeout=120) as response:
+            response.raise_for_status()
             with open(name, "wb") as f:
-                shutil.copyfileobj(response, f)
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
         return name
     except Exception as e:
         print(f"  [ERROR] {e}")
         return None
 
 
+def file_matches_entry(info: zipfile.ZipInfo) -> bool:
+    """Check whether the file on disk already matches a zip entry."""
+    path = Path(info.filename)
+    
+    # Size is a free check before hashing anything
+    if not path.is_file() or path.stat().st_size != info.file_size:
+        return False
+    
+    with open(path, 'rb') as f:
+        # Larger files are hashed straight from a read-only mapping (no copies)
+        if info.file_size >= MMAP_MIN_SIZE:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return binascii.crc32(mm) == info.CRC
+            except (OSError, ValueError):
+                pass  # e.g. locked on Windows - fall back to plain reads
+        
+        crc = 0
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            crc = binascii.crc32(chunk, crc)
+    return crc == info.CRC
+
+
+def stage_entry(zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Write a zip entry next to its target as <name>.update-tmp, unless the
+    file on disk already matches. Returns (tmp, dest), or None if unchanged.
+    """
+    if file_matches_entry(info):
+        return None
+    
+    dest = Path(info.filename)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.update-tmp")
+    try:
+        with zf.open(info) as src, open(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp, dest
+
+
 def extract_and_update(zip_path: str):
-    """Extract zip and update files."""
+    """Extract zip and update files in place."""
     print(f"  Extracting {zip_path}...")
     
-    # Create temp directory
-    temp_dir = Path("_update_temp")
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-    temp_dir.mkdir()
-    
     try:
-        # Extract zip
         with zipfile.ZipFile(zip_path, 'r') as zf:
-            zf.extractall(temp_dir)
-        
-        # Copy files to current directory
-        for item in temp_dir.iterdir():
-            dest = Path(item.name)
-            if item.is_dir():
-                if dest.exists():
-                    shutil.rmtree(dest)
-                shutil.copytree(item, dest)
-            else:
-                shutil.copy2(item, dest)
+            # Fail before touching anything if an entry would escape the app dir
+            entries = [info for info in zf.infolist() if not info.is_dir()]
+            for info in entries:
+                path = Path(info.filename)
+                if path.is_absolute() or '..' in path.parts:
+                    raise zipfile.BadZipFile(f"unsafe entry {info.filename}")
+            wanted = {Path(info.filename) for info in entries}
+            
+            # Stage entries whose content differs from disk next to their
+            # targets (the CRC comes free from the central directory). Entries
+            # are independent files, so they are checked and written in parallel.
+            # Reading an entry verifies its CRC, so a corrupt archive fails
+            # here and every staged file is discarded before anything is replaced
+            with ThreadPoolExecutor(max_workers=STAGE_WORKERS) as pool:
+                futures = [pool.submit(stage_entry, zf, info) for info in entries]
+                wait(futures)
+            staged = [f.result() for f in futures if not f.exception() and f.result()]
+            errors = [f.exception() for f in futures if f.exception()]
+            if errors:
+                for tmp, _ in staged:
+                    tmp.unlink(missing_ok=True)
+                raise errors[0]
+            
+            # Swap each staged file in with one atomic rename, so a failed
+            # update never leaves a half-written file behind
+            for tmp, dest in staged:
+                os.replace(tmp, dest)
+            changed = len(staged)
+            
+            # Top-level directories mirror the release, so files
+            # dropped from it don't linger
+            top_dirs = {path.parts[0] for path in wanted if len(path.parts) > 1}
+            for name in top_dirs:
+                if not Path(name).is_dir():
+                    continue
+                for path in Path(name).rglob('*'):
+                    if path.is_file() and path not in wanted:
+                        path.unlink()
         
-        print("  [OK] Files updated")
+        print(f"  [OK] Files updated ({changed} changed)")
         return True
         
     except Exception as e:
@@ -158,8 +217,6 @@ def extract_and_update(zip_path: str):
         return False
     finally:
         # Cleanup
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
         if os.path.exists(zip_path):
             os.remove(zip_path)
 
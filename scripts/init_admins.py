@@ -7,18 +7,19 @@ Usage:
 """
 
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from services.db_service import get_db_service, init_db
-from services.auth_service import AuthService
-from models.database import User
-
 
 def create_initial_admins():
     """Create the initial admin users."""
+    # Imported here so SQLAlchemy and the models load only when needed
+    from services.db_service import get_db_service, init_db
+    from services.auth_service import AuthService
+    from models.database import User
     
     # Initialize database
     init_db()
@@ -49,40 +50,48 @@ def create_initial_admins():
         print("=" * 60)
         print()
         
+        # Look up all existing admins in one query
+        emails = [a["email"].lower() for a in admins]
+        existing = {
+            u.email: u
+            for u in session.query(User).filter(User.email.in_(emails)).all()
+        }
+        
         for admin_info in admins:
             email = admin_info["email"].lower()
             name = admin_info["name"]
+            temp_password = auth_service.generate_temp_password()
+            user = existing.get(email)
             
-            # Check if user already exists
-            existing = auth_service.get_user_by_email(email)
-            
-            if existing:
+            if user:
                 # Reset password for existing admin
-                temp_password = auth_service.reset_password(email)
-                if temp_password:
-                    created_users.append({
-                        "name": name,
-                        "email": email,
-                        "password": temp_password,
-                        "status": "Password Reset"
-                    })
-                    print(f"  [OK] {name} - password reset")
-                else:
-                    print(f"  [!] {name} - could not reset password")
+                user.password_hash = auth_service.hash_password(temp_password)
+                user.must_change_password = True
+                user.updated_at = datetime.utcnow()
+                status = "Password Reset"
+                print(f"  [OK] {name} - password reset")
             else:
                 # Create new admin user
-                user, temp_password = auth_service.create_user(
+                session.add(User(
                     email=email,
                     name=name,
-                    role="admin"
-                )
-                created_users.append({
-                    "name": name,
-                    "email": email,
-                    "password": temp_password,
-                    "status": "Created"
-                })
+                    role="admin",
+                    password_hash=auth_service.hash_password(temp_password),
+                    must_change_password=True,
+                    is_active=True
+                ))
+                status = "Created"
                 print(f"  [OK] {name} - account created")
+            
+            created_users.append({
+                "name": name,
+                "email": email,
+                "password": temp_password,
+                "status": status
+            })
+        
+        # Write all changes in one flush; get_session() commits on exit
+        session.flush()
         
         print()
         
@@ -14,13 +14,24 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+    """Column names of a table on an open connection (empty if it doesn't exist)."""
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    """Check if a table exists on an open connection."""
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    )
+    return cursor.fetchone() is not None
+
+
 def check_column_exists(db_path: str, table: str, column: str) -> bool:
     """Check if a column exists in a SQLite table."""
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [row[1] for row in cursor.fetchall()]
+        columns = _table_columns(conn, table)
         conn.close()
         return column in columns
     except Exception:
@@ -31,11 +42,9 @@ def check_table_exists(db_path: str, table: str) -> bool:
     """Check if a table exists in the database."""
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-        result = cursor.fetchone()
+        result = _table_exists(conn, table)
         conn.close()
-        return result is not None
+        return result
     except Exception:
         return False
 
@@ -52,8 +61,9 @@ def migrate_legacy_database(db_path: str):
     
     migrations_applied = []
     
-    # Check and add missing columns to users table
-    if check_table_exists(db_path, 'users'):
+    # Check and add missing columns to users table (one PRAGMA for all of them)
+    if _table_exists(conn, 'users'):
+        existing_columns = _table_columns(conn, 'users')
         user_columns_to_add = [
             ('password_hash', 'VARCHAR(255)'),
             ('role', "VARCHAR(50) DEFAULT 'member'"),
@@ -63,7 +73,7 @@ def migrate_legacy_database(db_path: str):
         ]
         
         for column_name, column_type in user_columns_to_add:
-            if not check_column_exists(db_path, 'users', column_name):
+            if column_name not in existing_columns:
                 try:
                     cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} {column_type}")
                     migrations_applied.append(f"Added users.{column_name}")
@@ -72,7 +82,7 @@ def migrate_legacy_database(db_path: str):
                     print(f"  ⚠️  Could not add users.{column_name}: {e}")
     
     # Create system_settings table if it doesn't exist
-    if not check_table_exists(db_path, 'system_settings'):
+    if not _table_exists(conn, 'system_settings'):
         try:
             cursor.execute("""
                 CREATE TABLE system_settings (
@@ -149,8 +159,11 @@ def run_migrations():
                 # New database - create tables and stamp
                 print("New database detected. Creating tables...")
                 from models.database import Base
-                Base.metadata.create_all(bind=db_service.engine)
-                command.stamp(alembic_cfg, "head")
+                # Create tables and stamp in one transaction (one commit)
+                with db_service.engine.begin() as conn:
+                    Base.metadata.create_all(bind=conn)
+                    alembic_cfg.attributes["connection"] = conn
+                    command.stamp(alembic_cfg, "head")
                 print("✅ Database initialized at latest version")
         else:
             # Run any pending migrations
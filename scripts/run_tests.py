@@ -18,8 +18,19 @@ def run_tests():
     print("🧪 Running unit tests...")
     print("=" * 60)
     
+    args = [sys.executable, "-m", "pytest", "tests/", "-v", "--tb=short",
+            "-p", "no:cacheprovider"]
+    
+    # Spread tests across CPU cores when pytest-xdist is available;
+    # loadfile keeps each test module (and its fixtures) on one worker
+    try:
+        import xdist  # noqa: F401
+        args += ["-n", "auto", "--dist=loadfile"]
+    except ImportError:
+        pass
+    
     result = subprocess.run(
-        [sys.executable, "-m", "pytest", "tests/", "-v", "--tb=short"],
+        args,
         cwd=PROJECT_ROOT,
         capture_output=False
     )
@@ -2,48 +2,282 @@
 Authentication service for user login and session management.
 """
 
+import os
+import time
+import hashlib
+import logging
 import bcrypt
 import secrets
 import string
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
-from sqlalchemy.orm import Session
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect as sa_inspect, or_
+from sqlalchemy.orm import Session, defer, make_transient_to_detached
 
 from models.database import User
 
+logger = logging.getLogger(__name__)
+
+try:
+    from argon2 import PasswordHasher
+except ImportError:  # Optional; new hashes fall back to bcrypt
+    PasswordHasher = None
+
 # Session token validity duration (30 days)
 SESSION_DURATION_DAYS = 30
 
+# bcrypt cost factor: each step doubles hashing time ("auto" calibrates on the host)
+BCRYPT_COST = os.getenv("AUTH_BCRYPT_COST", "10")
+MIN_BCRYPT_COST = 10
+MAX_BCRYPT_COST = 15   # ceiling for calibration
+BCRYPT_MAX_ROUNDS = 31  # bcrypt's own limit for an explicit setting
+
+# Scheme for new hashes; existing bcrypt hashes keep verifying and are
+# upgraded on the next successful login
+PASSWORD_SCHEME = os.getenv("AUTH_PASSWORD_SCHEME", "argon2id")
+
+# Argon2id with OWASP's minimum recommended parameters (46 MiB, t=1, p=1)
+ARGON2 = PasswordHasher(time_cost=1, memory_cost=46 * 1024, parallelism=1) if PasswordHasher else None
+
+# Opt-in in-process cache of user rows by email / session token (never the
+# password hash). Entries are dropped on every change made through
+# AuthService, but changes made by other processes or tools show up only
+# after the TTL - so it is off (0) by default; enable it for a single
+# app process with e.g. AUTH_USER_CACHE_TTL=60.
+USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "0"))
+USER_CACHE_SIZE = 10_000
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def get(self, key):
+        """Get a live entry, or None."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value) -> None:
+        """Store an entry, evicting the least recently used beyond maxsize."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key) -> None:
+        """Drop an entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
 
 class AuthService:
     """Handles user authentication and password management."""
     
-    def __init__(self, db_session: Session):
+    # Shared by every (request-scoped) AuthService in the process
+    _user_by_email_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+    _user_by_token_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+    
+    def __init__(
+        self,
+        db_session: Session,
+        bcrypt_cost: Optional[int] = None,
+        scheme: Optional[str] = None
+    ):
         self.db = db_session
+        self.bcrypt_cost = bcrypt_cost
+        self.scheme = scheme
+        self._autocommit = True
+    
+    def _commit(self) -> None:
+        """Commit now, or just flush while inside batch()."""
+        if self._autocommit:
+            self.db.commit()
+        else:
+            self.db.flush()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group several changes into one transaction (one commit).
+        
+        Usage:
+            with auth_service.batch():
+                auth_service.create_user(...)
+                auth_service.update_user_role(...)
+        """
+        # Nested batch: the outer one owns the commit
+        if not self._autocommit:
+            yield self
+            return
+        
+        self._autocommit = False
+        try:
+            yield self
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            self._autocommit = True
     
     @staticmethod
-    def hash_password(password: str) -> str:
-        """Hash a password using bcrypt."""
-        salt = bcrypt.gensalt()
+    def default_scheme() -> str:
+        """Scheme for new hashes: Argon2id when argon2-cffi is installed, else bcrypt."""
+        if PASSWORD_SCHEME == "argon2id" and ARGON2 is not None:
+            return "argon2id"
+        return "bcrypt"
+    
+    @staticmethod
+    def hash_password(password: str, cost: Optional[int] = None, scheme: Optional[str] = None) -> str:
+        """Hash a password (cost only applies to bcrypt, default AUTH_BCRYPT_COST)."""
+        if (scheme or AuthService.default_scheme()) == "argon2id" and ARGON2 is not None:
+            return ARGON2.hash(password)
+        salt = bcrypt.gensalt(rounds=cost or AuthService.default_cost())
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def default_cost() -> int:
+        """Cost factor from AUTH_BCRYPT_COST, calibrated once if set to 'auto'."""
+        if BCRYPT_COST.strip().lower() == "auto":
+            return AuthService.calibrate_cost()
+        return AuthService.parse_cost(BCRYPT_COST)
+    
+    @staticmethod
+    def parse_cost(value: str) -> int:
+        """Parse a cost setting, clamped to [MIN_BCRYPT_COST, BCRYPT_MAX_ROUNDS]."""
+        try:
+            cost = int(value.strip())
+        except ValueError:
+            logger.warning(f"Invalid AUTH_BCRYPT_COST {value!r}; using {MIN_BCRYPT_COST}")
+            return MIN_BCRYPT_COST
+        
+        clamped = min(max(cost, MIN_BCRYPT_COST), BCRYPT_MAX_ROUNDS)
+        if clamped != cost:
+            logger.warning(f"AUTH_BCRYPT_COST {cost} is out of range; using {clamped}")
+        return clamped
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def calibrate_cost(target_ms: int = 100) -> int:
+        """Highest cost (not below MIN_BCRYPT_COST) whose hash takes <= target_ms here."""
+        cost = MIN_BCRYPT_COST
+        while cost < MAX_BCRYPT_COST:
+            # Each extra round doubles the time, so predict from the current cost
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=cost))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms * 2 > target_ms:
+                break
+            cost += 1
+        return cost
+    
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
-        """Verify a password against its hash."""
+        """Verify a password against an Argon2id or bcrypt hash."""
         try:
+            if password_hash.startswith("$argon2"):
+                return ARGON2 is not None and ARGON2.verify(password_hash, password)
             return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
-        except Exception:
+        except Exception:  # mismatch or malformed hash
+            return False
+    
+    @staticmethod
+    def needs_rehash(password_hash: str, scheme: Optional[str] = None) -> bool:
+        """Whether a stored hash should be replaced with one using the current scheme."""
+        if (scheme or AuthService.default_scheme()) != "argon2id" or ARGON2 is None:
             return False
+        if not password_hash.startswith("$argon2id$"):
+            return True
+        return ARGON2.check_needs_rehash(password_hash)
     
     @staticmethod
     def generate_temp_password(length: int = 12) -> str:
         """Generate a secure temporary password (alphanumeric only for compatibility)."""
         alphabet = string.ascii_letters + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+        n = len(alphabet)
+        
+        # Draw random bytes in bulk and drop the biased top window (b >= 248)
+        # so every character stays uniform; one getrandom() call per password
+        limit = 256 - 256 % n
+        password = ''
+        while len(password) < length:
+            raw = secrets.token_bytes(length * 2)
+            password += ''.join(alphabet[b % n] for b in raw if b < limit)
+        return password[:length]
+    
+    @classmethod
+    def clear_user_cache(cls) -> None:
+        """Drop all cached user rows."""
+        cls._user_by_email_cache.clear()
+        cls._user_by_token_cache.clear()
+    
+    def _cache_user(self, user: User) -> None:
+        """Remember a freshly loaded user row by email and session token."""
+        # The password hash and deferred columns are left out (they load on
+        # access); authenticate() always reads the row from the database
+        unloaded = sa_inspect(user).unloaded
+        snapshot = {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+            if column.key != 'password_hash' and column.key not in unloaded
+        }
+        
+        self._user_by_email_cache.set(user.email, snapshot)
+        if user.session_token:
+            self._user_by_token_cache.set(user.session_token, snapshot)
+    
+    def _forget_user(self, user: User) -> None:
+        """Drop a user's cached rows; call before changing the user."""
+        self._user_by_email_cache.pop(user.email)
+        if user.session_token:
+            self._user_by_token_cache.pop(user.session_token)
+    
+    def _attach_cached(self, snapshot: dict) -> User:
+        """Turn a cached row into a User in this session without a query."""
+        existing = self.db.identity_map.get(self.db.identity_key(User, snapshot['id']))
+        if existing is not None:
+            return existing
+        
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return self.db.merge(user, load=False)
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email address."""
-        return self.db.query(User).filter(User.email == email).first()
+        snapshot = self._user_by_email_cache.get(email)
+        if snapshot is not None:
+            return self._attach_cached(snapshot)
+        
+        user = self.db.query(User).filter(User.email == email).first()
+        if user:
+            self._cache_user(user)
+        return user
     
     def authenticate(self, email: str, password: str) -> Tuple[bool, Optional[User], str]:
         """
@@ -52,7 +286,9 @@ class AuthService:
         Returns:
             Tuple of (success, user, message)
         """
-        user = self.get_user_by_email(email)
+        # Always the current row: a password, role or active flag changed
+        # elsewhere must take effect now, not after the cache TTL
+        user = self.db.query(User).populate_existing().filter(User.email == email).first()
         
         if not user:
             return False, None, "Invalid email or password"
@@ -66,6 +302,12 @@ class AuthService:
         if not self.verify_password(password, user.password_hash):
             return False, None, "Invalid email or password"
         
+        # Upgrade legacy (bcrypt) or outdated hashes while we know the password
+        if self.needs_rehash(user.password_hash, self.scheme):
+            self._forget_user(user)
+            user.password_hash = self.hash_password(password, self.bcrypt_cost, self.scheme)
+            self._commit()
+        
         return True, user, "Login successful"
     
     def change_password(self, user, new_password: str) -> bool:
@@ -79,10 +321,11 @@ class AuthService:
             if not user:
                 return False
         
-        user.password_hash = self.hash_password(new_password)
+        self._forget_user(user)
+        user.password_hash = self.hash_password(new_password, self.bcrypt_cost, self.scheme)
         user.must_change_password = False
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
         return True
     
     def create_user(
@@ -105,32 +348,64 @@ class AuthService:
             email=email,
             name=name,
             role=role,
-            password_hash=self.hash_password(temp_password),
+            password_hash=self.hash_password(temp_password, self.bcrypt_cost, self.scheme),
             must_change_password=password is None,  # Force change if temp
             is_active=True
         )
         
         self.db.add(user)
-        self.db.commit()
+        self._commit()
         self.db.refresh(user)
         
         return user, temp_password
     
+    def create_users_bulk(self, users: List[dict]) -> List[Tuple[User, str]]:
+        """
+        Create several users in one transaction.
+        
+        Args:
+            users: Dicts with create_user() arguments (email, name, role, password)
+        
+        Returns:
+            List of (user, temp_password) in input order
+        """
+        created = []
+        for info in users:
+            password = info.get('password')
+            temp_password = password or self.generate_temp_password()
+            user = User(
+                email=info['email'],
+                name=info['name'],
+                role=info.get('role', 'member'),
+                password_hash=self.hash_password(temp_password, self.bcrypt_cost, self.scheme),
+                must_change_password=password is None,
+                is_active=True
+            )
+            created.append((user, temp_password))
+        
+        # One INSERT round and one commit for the whole list
+        self.db.add_all([user for user, _ in created])
+        self._commit()
+        
+        return created
+    
     def update_user_role(self, user: User, new_role: str) -> bool:
         """Update user's role."""
         if new_role not in ('admin', 'member'):
             return False
         
+        self._forget_user(user)
         user.role = new_role
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
         return True
     
     def deactivate_user(self, user: User) -> bool:
         """Deactivate a user account."""
+        self._forget_user(user)
         user.is_active = False
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
         return True
     
     def get_all_users(self):
@@ -146,10 +421,11 @@ class AuthService:
                 return None
         
         temp_password = self.generate_temp_password()
-        user.password_hash = self.hash_password(temp_password)
+        self._forget_user(user)
+        user.password_hash = self.hash_password(temp_password, self.bcrypt_cost, self.scheme)
         user.must_change_password = True
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
         return temp_password
     
     @staticmethod
@@ -157,13 +433,22 @@ class AuthService:
         """Generate a secure session token."""
         return secrets.token_urlsafe(32)
     
+    @staticmethod
+    def hash_session_token(token: str) -> str:
+        """Hash a session token for storage; only the client keeps the raw token."""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
     def create_session(self, user: User) -> str:
         """Create a new session for user and return token."""
         token = self.generate_session_token()
-        user.session_token = token
+        self._forget_user(user)
+        user.session_token = self.hash_session_token(token)
         user.session_expires = datetime.utcnow() + timedelta(days=SESSION_DURATION_DAYS)
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
+        
+        # Logins are rare, so sweep stale tokens here rather than per request
+        self.purge_expired_sessions()
         return token
     
     def validate_session(self, token: str) -> Optional[User]:
@@ -171,23 +456,42 @@ class AuthService:
         if not token:
             return None
         
-        user = self.db.query(User).filter(User.session_token == token).first()
+        # Rows (and the cache) are keyed by the token's hash, never the token
+        token_hash = self.hash_session_token(token)
         
-        if not user:
-            return None
+        # Cached rows still go through the active/expiry checks below
+        snapshot = self._user_by_token_cache.get(token_hash)
+        if snapshot is not None and snapshot['is_active'] and (
+            not snapshot['session_expires'] or snapshot['session_expires'] >= datetime.utcnow()
+        ):
+            return self._attach_cached(snapshot)
         
-        if not user.is_active:
-            return None
+        # One indexed query covers the token, active and expiry checks;
+        # expired tokens are cleared in bulk by purge_expired_sessions()
+        # Sessions never need the password hash, so don't load it
+        user = self.db.query(User).options(defer(User.password_hash)).filter(
+            User.session_token == token_hash,
+            User.is_active == True,  # noqa: E712
+            or_(User.session_expires.is_(None), User.session_expires >= datetime.utcnow())
+        ).first()
         
-        # Check if session expired
-        if user.session_expires and user.session_expires < datetime.utcnow():
-            user.session_token = None
-            user.session_expires = None
-            self.db.commit()
+        if not user:
             return None
         
+        self._cache_user(user)
         return user
     
+    def purge_expired_sessions(self) -> int:
+        """Clear all expired session tokens in one UPDATE; returns rows changed."""
+        count = self.db.query(User).filter(
+            User.session_expires < datetime.utcnow()
+        ).update(
+            {User.session_token: None, User.session_expires: None},
+            synchronize_session=False
+        )
+        self._commit()
+        return count
+    
     def invalidate_session(self, user) -> None:
         """Invalidate user's session (logout)."""
         # Handle case where email string is passed instead of User object
@@ -196,8 +500,9 @@ class AuthService:
             if not user:
                 return
         
+        self._forget_user(user)
         user.session_token = None
         user.session_expires = None
         user.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
 
@@ -1,18 +1,28 @@
 """
 Cache service for storing and retrieving data.
-Currently uses SQLite, but designed to be swappable for Redis in cloud deployment.
+Uses Parquet files (or SQLite without pyarrow), but designed to be swappable
+for Redis in cloud deployment.
 """
 
+import os
+import atexit
 import sqlite3
+import threading
+import weakref
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from abc import ABC, abstractmethod
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # Optional; ParquetCacheService needs it
+    pyarrow = None
+
 
 class BaseCacheService(ABC):
     """Abstract base class for cache services."""
@@ -43,6 +53,20 @@ class BaseCacheService(ABC):
         pass
 
 
+# Instances with connections to close at exit; weak, so a discarded service
+# (and its connections) can still be garbage collected
+_live_sqlite_caches: "weakref.WeakSet[SQLiteCacheService]" = weakref.WeakSet()
+
+
+def _close_sqlite_caches() -> None:
+    """Close every live SQLiteCacheService's connections (one atexit hook for all)."""
+    for cache in list(_live_sqlite_caches):
+        cache.close()
+
+
+atexit.register(_close_sqlite_caches)
+
+
 class SQLiteCacheService(BaseCacheService):
     """SQLite-based cache service for local deployment."""
     
@@ -50,15 +74,43 @@ class SQLiteCacheService(BaseCacheService):
         self.cache_dir = cache_dir
         self.max_age_hours = max_age_hours
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # One open connection per key, shared across threads behind a lock
+        self._conns: Dict[str, sqlite3.Connection] = {}
+        self._lock = threading.RLock()
+        _live_sqlite_caches.add(self)
     
     def _get_db_path(self, key: str) -> Path:
         """Get database path for a cache key."""
         return self.cache_dir / f"{key}_cache.db"
     
+    def _open(self, key: str) -> sqlite3.Connection:
+        """Open a connection tuned for repeated local reads."""
+        conn = sqlite3.connect(self._get_db_path(key), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA cache_size=-65536")    # 64 MB
+        return conn
+    
     def _get_connection(self, key: str) -> sqlite3.Connection:
-        """Get database connection."""
-        db_path = self._get_db_path(key)
-        return sqlite3.connect(db_path)
+        """Get the cached database connection for a key (call with the lock held)."""
+        conn = self._conns.get(key)
+        if conn is None:
+            conn = self._conns[key] = self._open(key)
+        return conn
+    
+    def _close_connection(self, key: str) -> None:
+        """Close and forget the connection for a key."""
+        conn = self._conns.pop(key, None)
+        if conn is not None:
+            conn.close()
+    
+    def close(self) -> None:
+        """Close all open connections."""
+        with self._lock:
+            for key in list(self._conns):
+                self._close_connection(key)
     
     def get(self, key: str) -> Optional[pd.DataFrame]:
         """Retrieve data from SQLite cache."""
@@ -67,9 +119,9 @@ class SQLiteCacheService(BaseCacheService):
             return None
         
         try:
-            conn = self._get_connection(key)
-            df = pd.read_sql_query("SELECT * FROM fund_data", conn)
-            conn.close()
+            with self._lock:
+                conn = self._get_connection(key)
+                df = pd.read_sql_query("SELECT * FROM fund_data", conn)
             
             # Convert REPORT_DATE back to datetime
             if 'REPORT_DATE' in df.columns:
@@ -83,24 +135,24 @@ class SQLiteCacheService(BaseCacheService):
     def set(self, key: str, data: pd.DataFrame) -> None:
         """Store data in SQLite cache."""
         try:
-            conn = self._get_connection(key)
-            
-            # Store the data
-            data.to_sql('fund_data', conn, if_exists='replace', index=False)
-            
-            # Store metadata
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS cache_metadata (
-                    key TEXT PRIMARY KEY,
-                    timestamp TEXT
-                )
-            """)
-            conn.execute("""
-                INSERT OR REPLACE INTO cache_metadata (key, timestamp) 
-                VALUES (?, ?)
-            """, (key, datetime.now().isoformat()))
-            conn.commit()
-            conn.close()
+            with self._lock:
+                conn = self._get_connection(key)
+                
+                # Store the data
+                data.to_sql('fund_data', conn, if_exists='replace', index=False)
+                
+                # Store metadata
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache_metadata (
+                        key TEXT PRIMARY KEY,
+                        timestamp TEXT
+                    )
+                """)
+                conn.execute("""
+                    INSERT OR REPLACE INTO cache_metadata (key, timestamp) 
+                    VALUES (?, ?)
+                """, (key, datetime.now().isoformat()))
+                conn.commit()
             
             logger.info(f"Saved {len(data)} records to cache for {key}")
         except Exception as e:
@@ -113,13 +165,12 @@ class SQLiteCacheService(BaseCacheService):
             return None
         
         try:
-            conn = self._get_connection(key)
-            cursor = conn.execute(
-                "SELECT timestamp FROM cache_metadata WHERE key = ?", 
-                (key,)
-            )
-            row = cursor.fetchone()
-            conn.close()
+            with self._lock:
+                conn = self._get_connection(key)
+                row = conn.execute(
+                    "SELECT timestamp FROM cache_metadata WHERE key = ?", 
+                    (key,)
+                ).fetchone()
             
             if row:
                 cached_time = datetime.fromisoformat(row[0])
@@ -140,11 +191,91 @@ class SQLiteCacheService(BaseCacheService):
     def clear(self, key: str) -> None:
         """Clear cached data for a key."""
         db_path = self._get_db_path(key)
-        if db_path.exists():
-            db_path.unlink()
+        with self._lock:
+            self._close_connection(key)
+            if not db_path.exists():
+                return
+            
+            # WAL mode keeps -wal/-shm side files next to the database
+            for path in (db_path, db_path.with_name(db_path.name + "-wal"),
+                         db_path.with_name(db_path.name + "-shm")):
+                if path.exists():
+                    path.unlink()
+        logger.info(f"Cleared cache for {key}")
+
+
+class ParquetCacheService(BaseCacheService):
+    """Parquet-based cache service: one compressed columnar file per key."""
+    
+    def __init__(self, cache_dir: Path, max_age_hours: float = 24):
+        self.cache_dir = cache_dir
+        self.max_age_hours = max_age_hours
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _get_path(self, key: str) -> Path:
+        """Get Parquet file path for a cache key."""
+        return self.cache_dir / f"{key}_cache.parquet"
+    
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Retrieve data from Parquet cache (dtypes, incl. REPORT_DATE, are preserved)."""
+        path = self._get_path(key)
+        if not path.exists():
+            return None
+        
+        try:
+            return pd.read_parquet(path, engine='pyarrow', memory_map=True)
+        except Exception as e:
+            logger.error(f"Error loading from cache: {e}")
+            return None
+    
+    def set(self, key: str, data: pd.DataFrame) -> None:
+        """Store data in Parquet cache."""
+        path = self._get_path(key)
+        tmp_path = path.with_name(path.name + ".tmp")
+        
+        try:
+            # Write aside and swap in, so readers never see a partial file
+            data.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved {len(data)} records to cache for {key}")
+        except Exception as e:
+            logger.error(f"Error saving to cache: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def get_age_hours(self, key: str) -> Optional[float]:
+        """Get age of cached data in hours (from the file's mtime)."""
+        try:
+            mtime = self._get_path(key).stat().st_mtime
+        except OSError:
+            return None
+        
+        age = datetime.now() - datetime.fromtimestamp(mtime)
+        return age.total_seconds() / 3600
+    
+    def is_valid(self, key: str, max_age_hours: Optional[float] = None) -> bool:
+        """Check if cached data is still valid."""
+        max_age = max_age_hours or self.max_age_hours
+        age = self.get_age_hours(key)
+        if age is None:
+            return False
+        return age < max_age
+    
+    def clear(self, key: str) -> None:
+        """Clear cached data for a key."""
+        path = self._get_path(key)
+        if path.exists():
+            path.unlink()
             logger.info(f"Cleared cache for {key}")
 
 
+def create_cache_service(cache_dir: Path, max_age_hours: float = 24) -> BaseCacheService:
+    """Create the local cache service: Parquet when pyarrow is installed, else SQLite."""
+    if pyarrow is not None:
+        return ParquetCacheService(cache_dir=cache_dir, max_age_hours=max_age_hours)
+    return SQLiteCacheService(cache_dir=cache_dir, max_age_hours=max_age_hours)
+
+
 # Future: Redis cache service for cloud deployment
 # class RedisCacheService(BaseCacheService):
 #     def __init__(self, redis_url: str, max_age_hours: float = 24):
@@ -2,9 +2,16 @@
 Data service for fetching and processing fund data.
 """
 
+import re
+import numpy as np
 import pandas as pd
 import requests
-from typing import Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional, List
 import logging
 
 from models.dataset import Dataset
@@ -12,6 +19,25 @@ from services.cache_service import BaseCacheService
 
 logger = logging.getLogger(__name__)
 
+# Same result as replacing '1;' then '&amp;' with '&' (covers '1;amp;' too)
+FUND_NAME_ENCODING_RE = re.compile(r'(?:1;|&)amp;|1;')
+
+# Display-only ratio columns, safe as float32. Yields, fees, exposures, risk
+# and money amounts stay float64: they feed yield compounding, filter range
+# checks and find-better thresholds, where float32 values such as 70.3 no
+# longer compare equal to the float64 bounds
+FLOAT32_COLUMNS_RE = re.compile(r'SHARPE|ALPHA')
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON parser
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional columnar builder (ships with streamlit)
+    pa = None
+
 
 class DataService:
     """Service for fetching and processing fund data from data.gov.il API."""
@@ -21,12 +47,21 @@ class DataService:
         cache_service: BaseCacheService,
         api_base_url: str,
         batch_size: int = 32000,
-        timeout: int = 30
+        timeout: int = 30,
+        max_workers: int = 8
     ):
         self.cache = cache_service
         self.api_base_url = api_base_url
         self.batch_size = batch_size
         self.timeout = timeout
+        self.max_workers = max_workers
+        
+        # Keep-alive session shared by the page-fetching threads
+        self._session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
     
     def get_data(self, dataset: Dataset, force_refresh: bool = False) -> pd.DataFrame:
         """
@@ -53,90 +88,176 @@ class DataService:
         
         # Save to cache
         if not df.empty:
+            df = self._shrink_dtypes(df)
             self.cache.set(cache_key, df)
         
         return df
     
     def _fetch_from_api(self, dataset: Dataset) -> pd.DataFrame:
         """Fetch data from the API for all resource IDs in a dataset."""
-        all_records = []
-        
-        for resource_id in dataset.resource_ids:
-            records = self._fetch_resource(resource_id)
-            all_records.extend(records)
+        pages = (
+            page
+            for resource_id in dataset.resource_ids
+            for page in self._iter_pages(resource_id)
+        )
+        df = self._pages_to_frame(pages)
         
-        if not all_records:
+        if df.empty:
             return pd.DataFrame()
         
-        df = pd.DataFrame(all_records)
         df = self._process_data(df, dataset)
         
         return df
     
-    def _fetch_resource(self, resource_id: str) -> List[dict]:
-        """Fetch all records from a single resource."""
-        records = []
-        offset = 0
+    def _fetch_page(self, resource_id: str, offset: int) -> Optional[dict]:
+        """Fetch one page of a resource; returns the API result or None on error."""
+        try:
+            params = {
+                "resource_id": resource_id,
+                "limit": self.batch_size,
+                "offset": offset
+            }
+            response = self._session.get(
+                self.api_base_url, 
+                params=params, 
+                timeout=self.timeout
+            )
+            data = orjson.loads(response.content) if orjson is not None else response.json()
+            
+            if not data.get("success"):
+                logger.error(f"API Error for resource {resource_id}: {data.get('error')}")
+                return None
+            
+            return data["result"]
+            
+        except Exception as e:
+            logger.error(f"Error fetching resource {resource_id} at offset {offset}: {e}")
+            return None
+    
+    def _iter_pages(self, resource_id: str) -> Iterator[List[dict]]:
+        """Yield the record pages of a single resource, in offset order."""
+        # The first page tells us the total, so the rest can be fetched in parallel
+        first = self._fetch_page(resource_id, 0)
+        if first is None:
+            return
         
-        while True:
-            try:
-                params = {
-                    "resource_id": resource_id,
-                    "limit": self.batch_size,
-                    "offset": offset
-                }
-                response = requests.get(
-                    self.api_base_url, 
-                    params=params, 
-                    timeout=self.timeout
-                )
-                data = response.json()
+        total = first["total"]
+        fetched = len(first["records"])
+        yield first["records"]
+        del first
+        
+        offsets = iter(range(self.batch_size, total, self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Keep only max_workers pages in flight so finished pages don't pile up
+            pending = deque(
+                executor.submit(self._fetch_page, resource_id, offset)
+                for offset in islice(offsets, self.max_workers)
+            )
+            while pending:
+                page = pending.popleft().result()
                 
-                if not data.get("success"):
-                    logger.error(f"API Error for resource {resource_id}: {data.get('error')}")
+                # Stop at the first failure to keep pages in order
+                if page is None:
+                    for future in pending:
+                        future.cancel()
                     break
                 
-                batch = data["result"]["records"]
-                records.extend(batch)
-                total = data["result"]["total"]
-                
-                logger.info(f"Fetched {len(batch)} records (total: {len(records)}/{total})")
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(executor.submit(self._fetch_page, resource_id, offset))
                 
-                if offset + self.batch_size >= total:
-                    break
-                offset += self.batch_size
-                
-            except Exception as e:
-                logger.error(f"Error fetching resource {resource_id}: {e}")
-                break
+                fetched += len(page["records"])
+                yield page["records"]
         
-        return records
+        logger.info(f"Fetched {fetched}/{total} records for resource {resource_id}")
+    
+    def _fetch_resource(self, resource_id: str) -> List[dict]:
+        """Fetch all records from a single resource."""
+        return [record for page in self._iter_pages(resource_id) for record in page]
+    
+    @staticmethod
+    def _pages_to_frame(pages: Iterable[List[dict]]) -> pd.DataFrame:
+        """
+        Build one DataFrame from record pages.
+        
+        With pyarrow each page is turned into a compact Arrow table as it
+        arrives, so only a few pages of record dicts are alive at once
+        instead of the whole dataset.
+        """
+        pages = iter(pages)
+        if pa is None:
+            return pd.DataFrame([record for page in pages for record in page])
+        
+        def pandas_fallback(remaining):
+            # Mixed-type column; let pandas infer object dtype from the raw records
+            records = [record for table in tables for record in table.to_pylist()]
+            records.extend(record for page in remaining for record in page)
+            return pd.DataFrame(records)
+        
+        tables = []
+        for page in pages:
+            try:
+                tables.append(pa.Table.from_pylist(page))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                return pandas_fallback(chain([page], pages))
+        
+        if not tables:
+            return pd.DataFrame()
+        
+        # Permissive promotion unifies pages where a column was all-null or int
+        try:
+            table = pa.concat_tables(tables, promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pandas_fallback([])
+        
+        # self_destruct frees each Arrow column once it is converted
+        del tables
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
+    @staticmethod
+    def _records_to_frame(records: List[dict]) -> pd.DataFrame:
+        """Build a DataFrame from records, via Arrow's columnar builder when available."""
+        return DataService._pages_to_frame([records])
     
     def _process_data(self, df: pd.DataFrame, dataset: Dataset) -> pd.DataFrame:
         """Process raw data: apply filters, fix encoding, convert values."""
         
+        # Build one row mask (filters and dedupe) so the frame is copied once
+        keep = np.ones(len(df), dtype=bool)
+        
         # Apply dataset filter if defined
         if dataset.filter:
             for col, values in dataset.filter.items():
                 if col in df.columns:
-                    df = df[df[col].isin(values)]
+                    keep &= df[col].isin(values).to_numpy()
         
-        # Fix encoding issues in FUND_NAME (e.g., S1;P500 -> S&P500)
+        # Fund names repeat every month, so string work runs on the distinct
+        # names only and is broadcast back to the rows through their codes
         if 'FUND_NAME' in df.columns:
-            df['FUND_NAME'] = df['FUND_NAME'].str.replace('1;', '&', regex=False)
-            df['FUND_NAME'] = df['FUND_NAME'].str.replace('&amp;', '&', regex=False)
-        
-        # Remove IRA funds (בניהול אישי - self-managed)
-        if 'FUND_NAME' in df.columns and not df.empty:
-            df = df[~df['FUND_NAME'].str.contains('בניהול אישי', na=False)]
+            name_codes, names = pd.factorize(df['FUND_NAME'], use_na_sentinel=False)
+            
+            # Remove IRA funds (בניהול אישי - self-managed)
+            is_ira = np.asarray(names.str.contains('בניהול אישי', regex=False, na=False), dtype=bool)
+            keep &= ~is_ira[name_codes]
         
-        # Remove duplicates
+        # Remove duplicates among the surviving rows (first one wins)
         if 'FUND_ID' in df.columns and 'REPORT_PERIOD' in df.columns:
-            df = df.drop_duplicates(subset=['FUND_ID', 'REPORT_PERIOD'], keep='first')
+            duplicated = df.loc[keep, ['FUND_ID', 'REPORT_PERIOD']].duplicated(keep='first')
+            keep[keep] = ~duplicated.to_numpy()
+        
+        df = df.loc[keep].copy()
         
-        # Create date column for plotting
+        # Fix encoding issues in FUND_NAME (e.g., S1;P500 -> S&P500, &amp; -> &)
+        if 'FUND_NAME' in df.columns:
+            fixed_names = names.str.replace(FUND_NAME_ENCODING_RE, '&', regex=True)
+            df['FUND_NAME'] = fixed_names.take(name_codes[keep])
+        
+        # Create date column for plotting; there are only a few hundred
+        # distinct periods, so parse each once and broadcast back to the rows
         if 'REPORT_PERIOD' in df.columns:
-            df['REPORT_DATE'] = pd.to_datetime(df['REPORT_PERIOD'].astype(str), format='%Y%m')
+            codes, periods = pd.factorize(df['REPORT_PERIOD'], use_na_sentinel=False)
+            dates = pd.to_datetime(pd.Index(periods).astype(str), format='%Y%m')
+            df['REPORT_DATE'] = dates.take(codes)
         
         # Convert exposure values to percentages if needed
         df = self._convert_exposure_to_percentage(df)
@@ -146,68 +267,96 @@ class DataService:
         
         return df
     
+    @staticmethod
+    def _shrink_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Store columns in the smallest dtype that holds them, roughly halving
+        the frame in memory and in the cache.
+        
+        Display-only ratio columns become float32, integers int32 and repeated
+        strings category (group on them with observed=True), so callers must
+        not assume int64/object columns.
+        """
+        for col in df.columns:
+            series = df[col]
+            
+            if pd.api.types.is_float_dtype(series) and FLOAT32_COLUMNS_RE.search(col):
+                df[col] = series.astype(np.float32)
+            
+            elif pd.api.types.is_integer_dtype(series) and not series.empty:
+                if np.iinfo(np.int32).min <= series.min() and series.max() <= np.iinfo(np.int32).max:
+                    df[col] = series.astype(np.int32)
+            
+            elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+                # Fund names, managers, classifications repeat across months
+                if series.nunique(dropna=True) <= len(series) // 2:
+                    df[col] = series.astype('category')
+        
+        return df
+    
     def _compute_trailing_yields(self, df: pd.DataFrame) -> pd.DataFrame:
         """Compute trailing compounded yields for 3M, 6M, and 1Y periods."""
         if 'FUND_ID' not in df.columns or 'MONTHLY_YIELD' not in df.columns or 'REPORT_DATE' not in df.columns:
             return df
         
-        df = df.sort_values(['FUND_ID', 'REPORT_DATE']).copy()
+        df = df.sort_values(['FUND_ID', 'REPORT_DATE'])  # already a new frame
         
-        # Initialize columns
-        df['TRAILING_3M_YIELD'] = None
-        df['TRAILING_6M_YIELD'] = None
-        df['TRAILING_1Y_YIELD'] = None
+        # Compounding is a sum in log space: prod(1 + r) = exp(sum(log1p(r)))
+        log_return = np.log1p(pd.to_numeric(df['MONTHLY_YIELD'], errors='coerce').to_numpy(dtype='float64') / 100)
+        missing = np.isnan(log_return)
         
-        # Group by fund and compute trailing yields
-        for fund_id, fund_df in df.groupby('FUND_ID'):
-            fund_df = fund_df.sort_values('REPORT_DATE')
-            monthly_yields = fund_df['MONTHLY_YIELD'].values
-            indices = fund_df.index.tolist()
-            
-            for i, idx in enumerate(indices):
-                # 3M trailing (need at least 3 months)
-                if i >= 2:
-                    yields_3m = monthly_yields[i-2:i+1]
-                    if len(yields_3m) == 3 and not pd.isna(yields_3m).any():
-                        compounded = self._compound_yields(yields_3m)
-                        df.loc[idx, 'TRAILING_3M_YIELD'] = compounded
-                
-                # 6M trailing (need at least 6 months)
-                if i >= 5:
-                    yields_6m = monthly_yields[i-5:i+1]
-                    if len(yields_6m) == 6 and not pd.isna(yields_6m).any():
-                        compounded = self._compound_yields(yields_6m)
-                        df.loc[idx, 'TRAILING_6M_YIELD'] = compounded
-                
-                # 1Y trailing (need at least 12 months)
-                if i >= 11:
-                    yields_1y = monthly_yields[i-11:i+1]
-                    if len(yields_1y) == 12 and not pd.isna(yields_1y).any():
-                        compounded = self._compound_yields(yields_1y)
-                        df.loc[idx, 'TRAILING_1Y_YIELD'] = compounded
+        # One cumulative pass serves every window: a window's sum (and its
+        # count of missing months) is the difference of two prefix sums
+        log_prefix = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, log_return))))
+        missing_prefix = np.concatenate(([0], np.cumsum(missing)))
+        
+        # Rows are sorted by fund, so each fund is one contiguous segment and
+        # its boundaries come from comparing neighbours (no hashing or re-sort)
+        fund_ids = df['FUND_ID'].to_numpy()
+        known_fund = ~pd.isna(fund_ids)
+        n = len(fund_ids)
+        segment_starts = np.concatenate(([0], np.flatnonzero(fund_ids[1:] != fund_ids[:-1]) + 1))
+        row_start = np.repeat(segment_starts, np.diff(np.append(segment_starts, n)))
+        end = np.arange(1, n + 1)
+        
+        for col, window in (('TRAILING_3M_YIELD', 3), ('TRAILING_6M_YIELD', 6), ('TRAILING_1Y_YIELD', 12)):
+            start = end - window
+            # Full window inside the fund, known fund, no missing month
+            valid = (start >= row_start) & known_fund
+            start = np.maximum(start, 0)
+            valid &= (missing_prefix[end] - missing_prefix[start]) == 0
+            log_sum = log_prefix[end] - log_prefix[start]
+            df[col] = np.where(valid, np.round(np.expm1(log_sum) * 100, 2), np.nan)
         
         logger.info(f"Computed trailing yields: 3M={df['TRAILING_3M_YIELD'].notna().sum()}, "
                    f"6M={df['TRAILING_6M_YIELD'].notna().sum()}, 1Y={df['TRAILING_1Y_YIELD'].notna().sum()}")
         
         return df
     
-    def _compound_yields(self, yields: list) -> float:
-        """Calculate compounded yield from a list of monthly yields."""
-        # (1 + r1/100) * (1 + r2/100) * ... - 1, then * 100
-        product = 1.0
-        for y in yields:
-            product *= (1 + y / 100)
-        return round((product - 1) * 100, 2)
-    
     def _convert_exposure_to_percentage(self, df: pd.DataFrame) -> pd.DataFrame:
         """Convert exposure columns from absolute values to percentages."""
         exposure_cols = ['STOCK_MARKET_EXPOSURE', 'FOREIGN_EXPOSURE', 'FOREIGN_CURRENCY_EXPOSURE']
+        if 'TOTAL_ASSETS' not in df.columns:
+            return df
+        
+        total = df['TOTAL_ASSETS'].to_numpy(dtype='float64')
         
         for col in exposure_cols:
-            if col in df.columns and 'TOTAL_ASSETS' in df.columns:
-                # If max > 100, values are absolute and need conversion
-                if df[col].max() > 100:
-                    df[col] = (df[col] / df['TOTAL_ASSETS'] * 100).round(2)
+            if col not in df.columns:
+                continue
+            
+            # If max > 100, values are absolute and need conversion
+            # (fmax.reduce skips NaN like Series.max)
+            values = df[col].to_numpy(dtype='float64', copy=True)
+            if not values.size or not np.fmax.reduce(values) > 100:
+                continue
+            
+            # Convert in place on the private copy: no temporaries per step
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.divide(values, total, out=values)
+            np.multiply(values, 100, out=values)
+            np.round(values, 2, out=values)
+            df[col] = values
         
         return df
     
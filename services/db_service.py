@@ -3,12 +3,13 @@ Database service for managing SQLAlchemy connections and sessions.
 """
 
 import os
+import threading
 from pathlib import Path
 from contextlib import contextmanager
 from typing import Generator, Optional
 import logging
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
@@ -16,6 +17,14 @@ from models.database import Base
 
 logger = logging.getLogger(__name__)
 
+# Connection pool for server databases (PostgreSQL). Each app process holds up
+# to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so keep that times the number
+# of processes below the server's max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 
 class DatabaseService:
     """
@@ -58,25 +67,63 @@ class DatabaseService:
         return f"sqlite:///{db_path}"
     
     def _create_engine(self):
-        """Create SQLAlchemy engine with appropriate settings."""
+        """
+        Create SQLAlchemy engine with appropriate settings.
+        
+        Pooled engines use pool_pre_ping: each checkout costs one extra
+        round trip, in exchange for never handing out a connection the
+        server has already dropped.
+        """
         if self.database_url.startswith("sqlite"):
-            # SQLite-specific settings
-            return create_engine(
+            # An in-memory database only exists on its one connection
+            if self._is_sqlite_memory(self.database_url):
+                return create_engine(
+                    self.database_url,
+                    connect_args={"check_same_thread": False},
+                    poolclass=StaticPool,
+                    echo=os.getenv("SQL_ECHO", "false").lower() == "true"
+                )
+            
+            # File database: pooled connections so requests can read concurrently
+            engine = create_engine(
                 self.database_url,
                 connect_args={"check_same_thread": False},
-                poolclass=StaticPool,
+                pool_pre_ping=True,
+                pool_size=10,
+                max_overflow=20,
                 echo=os.getenv("SQL_ECHO", "false").lower() == "true"
             )
+            event.listen(engine, "connect", self._set_sqlite_pragmas)
+            return engine
         else:
-            # PostgreSQL and other databases
+            # PostgreSQL and other databases; recycling keeps connections
+            # younger than server/proxy idle timeouts
             return create_engine(
                 self.database_url,
                 pool_pre_ping=True,
-                pool_size=5,
-                max_overflow=10,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
                 echo=os.getenv("SQL_ECHO", "false").lower() == "true"
             )
     
+    @staticmethod
+    def _is_sqlite_memory(url: str) -> bool:
+        """Check if a SQLite URL points at an in-memory database."""
+        return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+    
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """Per-connection SQLite settings: WAL lets readers run alongside a writer."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cursor.execute("PRAGMA cache_size=-65536")    # 64 MB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    
     def create_tables(self) -> None:
         """Create all database tables. Use for initial setup only."""
         Base.metadata.create_all(bind=self.engine)
@@ -117,13 +164,17 @@ class DatabaseService:
 
 # Global database service instance (lazy initialization)
 _db_service: Optional[DatabaseService] = None
+_db_service_lock = threading.Lock()
 
 
 def get_db_service() -> DatabaseService:
     """Get or create the global database service instance."""
     global _db_service
     if _db_service is None:
-        _db_service = DatabaseService()
+        # Double-checked so concurrent first calls build one engine/pool, not several
+        with _db_service_lock:
+            if _db_service is None:
+                _db_service = DatabaseService()
     return _db_service
 
 
@@ -2,12 +2,34 @@
 Find Better service - Logic for finding better funds.
 """
 
+import weakref
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import bindparam, insert, select
 from sqlalchemy.orm import Session
 
 from models.database import SystemSettings, DEFAULT_THRESHOLDS
-from utils.formatters import calculate_compounded_yield
+from utils.formatters import calculate_compounded_yield, calculate_compounded_yields
+
+
+# Settings statements, built once so every call reuses the same construct
+# (and its cached compiled SQL) instead of assembling a new one
+_ALL_THRESHOLDS = select(
+    SystemSettings.key,
+    SystemSettings.value,
+    SystemSettings.min_value,
+    SystemSettings.max_value,
+    SystemSettings.default_value,
+    SystemSettings.description
+)
+_SETTING_BY_KEY = select(SystemSettings).where(SystemSettings.key == bindparam('key'))
+
+
+def period_window_start(selected_period: int, period_months: int) -> int:
+    """First YYYYMM period of a window of period_months ending at selected_period."""
+    months = (selected_period // 100) * 12 + (selected_period % 100 - 1) - (period_months - 1)
+    return (months // 12) * 100 + months % 12 + 1
 
 
 class FindBetterService:
@@ -15,73 +37,90 @@ class FindBetterService:
     
     def __init__(self, db_session: Session):
         self.db = db_session
+        # Every threshold value, seeded by _init_default_settings() and kept
+        # current by update_threshold() for this service's lifetime
+        self._thresholds_cache: Dict[str, float] = {}
+        # (id(all_df), period_months, selected_period) -> (weakref to all_df, yields)
+        self._yield_cache: Dict[Tuple[int, int, int], Tuple[weakref.ref, pd.Series]] = {}
         self._init_default_settings()
     
     def _init_default_settings(self):
         """Initialize or update default threshold settings."""
+        # One SELECT for every setting (the table is tiny), instead of one per key
+        existing = {s.key: s for s in self.db.query(SystemSettings).all()}
+        new_settings = []
+        
         for key, config in DEFAULT_THRESHOLDS.items():
-            existing = self.db.query(SystemSettings).filter(
-                SystemSettings.key == key
-            ).first()
+            setting = existing.get(key)
             
-            if not existing:
+            if setting is None:
                 # Create new setting
-                setting = SystemSettings(
-                    key=key,
-                    value=config['default'],
-                    min_value=config['min'],
-                    max_value=config['max'],
-                    default_value=config['default'],
-                    description=config['description']
-                )
-                self.db.add(setting)
+                new_settings.append({
+                    'key': key,
+                    'value': config['default'],
+                    'min_value': config['min'],
+                    'max_value': config['max'],
+                    'default_value': config['default'],
+                    'description': config['description']
+                })
             else:
                 # Update min/max/default if they changed
-                existing.min_value = config['min']
-                existing.max_value = config['max']
-                existing.default_value = config['default']
-                existing.description = config['description']
+                setting.min_value = config['min']
+                setting.max_value = config['max']
+                setting.default_value = config['default']
+                setting.description = config['description']
                 # Reset value to new default if it was using old default
-                if existing.value is None or existing.value == existing.default_value:
-                    existing.value = config['default']
+                if setting.value is None or setting.value == setting.default_value:
+                    setting.value = config['default']
+        
+        # New settings go in one executemany INSERT; no ORM objects or
+        # per-row primary key fetch, since nothing here needs the ids
+        if new_settings:
+            self.db.execute(insert(SystemSettings), new_settings)
+        
+        # The rows are at hand, so seed the threshold cache before commit expires them
+        self._thresholds_cache = {
+            s.key: s.value if s.value is not None else s.default_value
+            for s in existing.values()
+        }
+        self._thresholds_cache.update((s['key'], s['value']) for s in new_settings)
         
+        # Only changed existing rows are written as UPDATEs
         self.db.commit()
     
     def get_threshold(self, key: str) -> float:
         """Get a threshold value by key."""
-        setting = self.db.query(SystemSettings).filter(
-            SystemSettings.key == key
-        ).first()
-        
-        if setting:
-            return setting.value if setting.value is not None else setting.default_value
+        if key in self._thresholds_cache:
+            return self._thresholds_cache[key]
         
         # Fallback to default
         if key in DEFAULT_THRESHOLDS:
             return DEFAULT_THRESHOLDS[key]['default']
         return 0.0
     
+    def get_thresholds(self, keys: Sequence[str]) -> Dict[str, float]:
+        """Get several threshold values at once (same fallbacks as get_threshold)."""
+        return {key: self.get_threshold(key) for key in keys}
+    
     def get_all_thresholds(self) -> Dict[str, dict]:
         """Get all threshold settings."""
-        settings = self.db.query(SystemSettings).all()
-        result = {}
-        
-        for s in settings:
-            result[s.key] = {
-                'value': s.value if s.value is not None else s.default_value,
-                'min': s.min_value,
-                'max': s.max_value,
-                'default': s.default_value,
-                'description': s.description
-            }
+        # Plain rows of just these columns, without building ORM objects
+        rows = self.db.connection().execute(_ALL_THRESHOLDS).all()
         
-        return result
+        return {
+            key: {
+                'value': value if value is not None else default,
+                'min': min_value,
+                'max': max_value,
+                'default': default,
+                'description': description
+            }
+            for key, value, min_value, max_value, default, description in rows
+        }
     
     def update_threshold(self, key: str, value: float, updated_by: int = None) -> bool:
         """Update a threshold value."""
-        setting = self.db.query(SystemSettings).filter(
-            SystemSettings.key == key
-        ).first()
+        setting = self.db.execute(_SETTING_BY_KEY, {'key': key}).scalar_one_or_none()
         
         if not setting:
             return False
@@ -95,6 +134,9 @@ class FindBetterService:
         setting.value = value
         setting.updated_by = updated_by
         self.db.commit()
+        
+        # Keep the loaded thresholds current rather than reloading them all
+        self._thresholds_cache[key] = value
         return True
     
     def calculate_period_yield(
@@ -116,20 +158,23 @@ class FindBetterService:
         Returns:
             Compounded annualized yield for the period, or None if insufficient data
         """
+        # Already have every fund's yield for this window: just look it up
+        yields = self._cached_period_yields(all_df, period_months, selected_period)
+        if yields is not None:
+            value = yields.get(fund_id)
+            return None if value is None else float(value)
+        
         # Filter to this fund
-        fund_df = all_df[all_df['FUND_ID'] == fund_id].copy()
+        fund_df = all_df[all_df['FUND_ID'] == fund_id]
         
         if fund_df.empty:
             return None
         
-        # Convert period to date
-        selected_date = pd.to_datetime(str(selected_period), format='%Y%m')
-        start_date = selected_date - pd.DateOffset(months=period_months - 1)
-        
-        # Filter to date range
+        # Filter to period range (YYYYMM integers sort like dates)
+        start_period = period_window_start(selected_period, period_months)
         fund_df = fund_df[
-            (fund_df['REPORT_DATE'] >= start_date) & 
-            (fund_df['REPORT_DATE'] <= selected_date)
+            (fund_df['REPORT_PERIOD'] >= start_period) & 
+            (fund_df['REPORT_PERIOD'] <= selected_period)
         ]
         
         # Need at least 80% of months
@@ -143,6 +188,58 @@ class FindBetterService:
         # Calculate compounded yield
         return calculate_compounded_yield(fund_df['MONTHLY_YIELD'])
     
+    def calculate_period_yields(
+        self,
+        all_df: pd.DataFrame,
+        period_months: int,
+        selected_period: int
+    ) -> pd.Series:
+        """
+        Calculate COMPOUNDED yields for a period for every fund at once.
+        
+        Same rules as calculate_period_yield(), in one grouped pass.
+        
+        Results are memoized per frame and window for this service's lifetime,
+        so all_df must not be modified in place between calls.
+        
+        Returns:
+            Series of yields indexed by FUND_ID (funds with too little data are left out)
+        """
+        yields = self._cached_period_yields(all_df, period_months, selected_period)
+        if yields is not None:
+            return yields
+        
+        if all_df.empty or 'MONTHLY_YIELD' not in all_df.columns:
+            yields = pd.Series(dtype=float)
+        else:
+            # Slice the period range once for all funds, with plain integer compares
+            start_period = period_window_start(selected_period, period_months)
+            periods = all_df['REPORT_PERIOD']
+            in_range = all_df[(periods >= start_period) & (periods <= selected_period)]
+            
+            # Need at least 80% of months (and at least one)
+            min_months = max(int(period_months * 0.8), 1)
+            yields = calculate_compounded_yields(
+                in_range['MONTHLY_YIELD'], in_range['FUND_ID'], min_months=min_months
+            )
+        
+        key = (id(all_df), period_months, selected_period)
+        self._yield_cache[key] = (weakref.ref(all_df), yields)
+        return yields
+    
+    def _cached_period_yields(
+        self,
+        all_df: pd.DataFrame,
+        period_months: int,
+        selected_period: int
+    ) -> Optional[pd.Series]:
+        """Memoized calculate_period_yields() result for this frame, if any."""
+        entry = self._yield_cache.get((id(all_df), period_months, selected_period))
+        # The weakref guards against a new frame reusing a freed frame's id
+        if entry is None or entry[0]() is not all_df:
+            return None
+        return entry[1]
+    
     def get_eligible_funds(
         self,
         all_df: pd.DataFrame,
@@ -158,41 +255,62 @@ class FindBetterService:
         2. Has data for the required yield period
         3. Not the same fund
         """
-        # Filter to same classification
+        fund_ids = all_df['FUND_ID']
+        
+        # Same classification, excluding the user's fund: masks over the
+        # columns only, so no intermediate copies of the full history
+        candidate = (fund_ids != user_fund.get('FUND_ID')).to_numpy()
         classification = user_fund.get('FUND_CLASSIFICATION')
         if classification:
-            eligible = all_df[all_df['FUND_CLASSIFICATION'] == classification].copy()
-        else:
-            eligible = all_df.copy()
-        
-        # Exclude user's fund
-        user_fund_id = user_fund.get('FUND_ID')
-        eligible = eligible[eligible['FUND_ID'] != user_fund_id]
-        
-        # Get unique funds
-        unique_fund_ids = eligible['FUND_ID'].unique()
-        
-        # For each fund, check if we have enough data and calculate yield
-        eligible_funds = []
+            candidate = candidate & (all_df['FUND_CLASSIFICATION'] == classification).to_numpy()
+        
+        # Nothing to compare against: skip the yield pass entirely
+        if not candidate.any():
+            return self._no_eligible_funds(all_df)
+        
+        # Yields for every fund in one grouped pass
+        yields = self.calculate_period_yields(all_df, period_months, selected_period)
+        
+        # Latest row per fund that has a yield; only these rows are materialized
+        at_period = (
+            candidate &
+            (all_df['REPORT_PERIOD'] == selected_period).to_numpy() &
+            fund_ids.isin(yields.index).to_numpy()
+        )
+        latest = all_df[at_period].drop_duplicates('FUND_ID')
+        
+        if latest.empty:
+            return self._no_eligible_funds(all_df)
+        
+        # Keep the order in which funds first appear
+        fund_order = pd.Index(fund_ids[candidate].unique())
+        latest = latest.iloc[fund_order.get_indexer(latest['FUND_ID']).argsort(kind='stable')]
+        latest = latest.reset_index(drop=True)
+        latest['CALC_YIELD'] = latest['FUND_ID'].map(yields)
+        return latest
+    
+    @staticmethod
+    def _no_eligible_funds(all_df: pd.DataFrame) -> pd.DataFrame:
+        """Empty get_eligible_funds() result, with all_df's columns and dtypes plus CALC_YIELD."""
+        return all_df.iloc[0:0].assign(CALC_YIELD=pd.Series(dtype=float))
+    
+    @staticmethod
+    def _top_by_yield(df: pd.DataFrame, top_n: int, by, ascending) -> pd.DataFrame:
+        """
+        First top_n rows of df.sort_values(by, ascending), where by starts
+        with CALC_YIELD descending.
         
-        for fund_id in unique_fund_ids:
-            avg_yield = self.calculate_period_yield(
-                all_df, fund_id, period_months, selected_period
-            )
+        Only rows tied with or above the top_n-th highest yield are sorted.
+        """
+        if 0 < top_n < len(df):
+            yields = df['CALC_YIELD'].to_numpy(dtype=float, na_value=np.nan)
+            yields = np.where(np.isnan(yields), -np.inf, yields)
             
-            if avg_yield is not None:
-                # Get latest data for this fund
-                fund_latest = eligible[
-                    (eligible['FUND_ID'] == fund_id) & 
-                    (eligible['REPORT_PERIOD'] == selected_period)
-                ]
-                
-                if not fund_latest.empty:
-                    fund_data = fund_latest.iloc[0].to_dict()
-                    fund_data['CALC_YIELD'] = avg_yield
-                    eligible_funds.append(fund_data)
+            # O(n) selection of the cut-off; ties at the cut-off stay in for the sort
+            cutoff = np.partition(yields, len(yields) - top_n)[len(yields) - top_n]
+            df = df[yields >= cutoff]
         
-        return pd.DataFrame(eligible_funds)
+        return df.sort_values(by, ascending=ascending).head(top_n)
     
     def find_unrestricted_better(
         self,
@@ -208,24 +326,23 @@ class FindBetterService:
         1. Yield >= User's yield + yield_threshold
         2. STD <= User's STD - std_threshold (require lower risk)
         """
-        yield_threshold = self.get_threshold('yield_threshold')
-        std_threshold = self.get_threshold('std_threshold')
+        thresholds = self.get_thresholds(('yield_threshold', 'std_threshold'))
+        yield_threshold = thresholds['yield_threshold']
+        std_threshold = thresholds['std_threshold']
         
         user_std = user_fund.get('STANDARD_DEVIATION', 999)
         
         # Filter by yield improvement
         better = eligible_df[
             eligible_df['CALC_YIELD'] >= (user_yield + yield_threshold)
-        ].copy()
+        ]
         
         # Filter by STD (must be lower than user's STD minus threshold)
         if 'STANDARD_DEVIATION' in better.columns:
             better = better[better['STANDARD_DEVIATION'] <= (user_std - std_threshold)]
         
         # Sort by yield (highest first), then by lowest std
-        better = better.sort_values(['CALC_YIELD', 'STANDARD_DEVIATION'], ascending=[False, True])
-        
-        return better.head(top_n)
+        return self._top_by_yield(better, top_n, ['CALC_YIELD', 'STANDARD_DEVIATION'], [False, True])
     
     def find_similar_strategy_better(
         self,
@@ -242,12 +359,16 @@ class FindBetterService:
         2. Yield >= User's yield + yield_threshold
         3. STD <= User's STD - std_threshold (require lower risk)
         """
-        yield_threshold = self.get_threshold('yield_threshold')
-        std_threshold = self.get_threshold('std_threshold')
-        stock_threshold = self.get_threshold('stock_exposure_threshold')
-        foreign_threshold = self.get_threshold('foreign_exposure_threshold')
-        currency_threshold = self.get_threshold('currency_exposure_threshold')
-        liquidity_threshold = self.get_threshold('liquidity_threshold')
+        thresholds = self.get_thresholds((
+            'yield_threshold', 'std_threshold', 'stock_exposure_threshold',
+            'foreign_exposure_threshold', 'currency_exposure_threshold', 'liquidity_threshold'
+        ))
+        yield_threshold = thresholds['yield_threshold']
+        std_threshold = thresholds['std_threshold']
+        stock_threshold = thresholds['stock_exposure_threshold']
+        foreign_threshold = thresholds['foreign_exposure_threshold']
+        currency_threshold = thresholds['currency_exposure_threshold']
+        liquidity_threshold = thresholds['liquidity_threshold']
         
         user_std = user_fund.get('STANDARD_DEVIATION', 999)
         user_stock = user_fund.get('STOCK_MARKET_EXPOSURE', 0)
@@ -255,44 +376,40 @@ class FindBetterService:
         user_currency = user_fund.get('FOREIGN_CURRENCY_EXPOSURE', 0)
         user_liquidity = user_fund.get('LIQUID_ASSETS_PERCENT', 0)
         
-        better = eligible_df.copy()
-        
-        # Filter by yield improvement
-        better = better[better['CALC_YIELD'] >= (user_yield + yield_threshold)]
+        columns = eligible_df.columns
         
-        # Filter by STD (must be lower than user's STD minus threshold)
-        if 'STANDARD_DEVIATION' in better.columns:
-            better = better[better['STANDARD_DEVIATION'] <= (user_std - std_threshold)]
+        def values(col):
+            # Float columns (float64 from the data cache) are used as-is,
+            # without a copy; anything else is converted to float64
+            series = eligible_df[col]
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+                return series.to_numpy()
+            return series.to_numpy(dtype=np.float64, na_value=np.nan)
         
-        # Filter by exposures (within threshold)
-        if 'STOCK_MARKET_EXPOSURE' in better.columns:
-            better = better[
-                (better['STOCK_MARKET_EXPOSURE'] >= user_stock - stock_threshold) &
-                (better['STOCK_MARKET_EXPOSURE'] <= user_stock + stock_threshold)
-            ]
+        # AND every criterion into one NumPy mask, then slice once
+        mask = values('CALC_YIELD') >= (user_yield + yield_threshold)
         
-        if 'FOREIGN_EXPOSURE' in better.columns:
-            better = better[
-                (better['FOREIGN_EXPOSURE'] >= user_foreign - foreign_threshold) &
-                (better['FOREIGN_EXPOSURE'] <= user_foreign + foreign_threshold)
-            ]
-        
-        if 'FOREIGN_CURRENCY_EXPOSURE' in better.columns:
-            better = better[
-                (better['FOREIGN_CURRENCY_EXPOSURE'] >= user_currency - currency_threshold) &
-                (better['FOREIGN_CURRENCY_EXPOSURE'] <= user_currency + currency_threshold)
-            ]
-        
-        if 'LIQUID_ASSETS_PERCENT' in better.columns:
-            better = better[
-                (better['LIQUID_ASSETS_PERCENT'] >= user_liquidity - liquidity_threshold) &
-                (better['LIQUID_ASSETS_PERCENT'] <= user_liquidity + liquidity_threshold)
-            ]
+        # Filter by STD (must be lower than user's STD minus threshold)
+        if 'STANDARD_DEVIATION' in columns:
+            mask &= values('STANDARD_DEVIATION') <= (user_std - std_threshold)
+        
+        # Filter by exposures (within threshold of the user's fund)
+        for col, target, threshold in (
+            ('STOCK_MARKET_EXPOSURE', user_stock, stock_threshold),
+            ('FOREIGN_EXPOSURE', user_foreign, foreign_threshold),
+            ('FOREIGN_CURRENCY_EXPOSURE', user_currency, currency_threshold),
+            ('LIQUID_ASSETS_PERCENT', user_liquidity, liquidity_threshold),
+        ):
+            if col in columns:
+                # Two one-sided compares: |v - target| <= threshold rounds
+                # differently for funds sitting exactly at the edge
+                v = values(col)
+                mask &= (v >= target - threshold) & (v <= target + threshold)
+        
+        better = eligible_df.iloc[np.flatnonzero(mask)]
         
         # Sort by yield (highest first)
-        better = better.sort_values('CALC_YIELD', ascending=False)
-        
-        return better.head(top_n)
+        return self._top_by_yield(better, top_n, 'CALC_YIELD', False)
     
     def find_in_strategy_funds(
         self,
@@ -347,7 +464,7 @@ class FindBetterService:
             currency_threshold = self.get_threshold('currency_exposure_threshold')
         
         # Start with period data
-        candidates = period_df.copy()
+        candidates = period_df
         
         # Filter by product (FUND_CLASSIFICATION contains product info)
         if sub_product:
@@ -372,19 +489,15 @@ class FindBetterService:
             period_months_map = {'1M': 1, '3M': 3, '6M': 6, '1Y': 12, '3Y': 36, '5Y': 60}
             period_months = period_months_map.get(yield_period, 12)
             
-            # Calculate yield for each fund
-            calc_yields = {}
-            for fid in candidates['FUND_ID'].unique():
-                calc_yield = self.calculate_period_yield(all_df, fid, period_months, report_period)
-                if calc_yield is not None:
-                    calc_yields[fid] = calc_yield
+            # Calculate yield for every fund in one pass
+            calc_yields = self.calculate_period_yields(all_df, period_months, report_period)
             
             # Add calculated yield to candidates
-            candidates['CALC_YIELD'] = candidates['FUND_ID'].map(calc_yields)
+            candidates = candidates.assign(CALC_YIELD=candidates['FUND_ID'].map(calc_yields))
             yield_col = 'CALC_YIELD'
         
         # Filter: funds with valid yield data
-        candidates = candidates[candidates[yield_col].notna()].copy()
+        candidates = candidates[candidates[yield_col].notna()]
         
         # Filter by Yield: Fund Yield >= (target_yield + threshold)
         candidates = candidates[candidates[yield_col] >= (target_yield + yield_threshold)]
@@ -13,8 +13,17 @@ from sqlalchemy.orm import sessionmaker
 from models.database import Base, User, SystemSettings, DEFAULT_THRESHOLDS
 from models.dataset import Dataset, SubFilter, PopulationFilter, DatasetRegistry
 from services.auth_service import AuthService
-from services.cache_service import SQLiteCacheService
+from services.cache_service import SQLiteCacheService, ParquetCacheService
 from services.find_better_service import FindBetterService
+from services.data_service import DataService
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Keep AuthService's process-wide user cache from leaking between tests."""
+    AuthService.clear_user_cache()
+    yield
+    AuthService.clear_user_cache()
 
 
 @pytest.fixture
@@ -53,6 +62,19 @@ def cache_service(temp_dir):
     return SQLiteCacheService(cache_dir=temp_dir, max_age_hours=24)
 
 
+@pytest.fixture
+def parquet_cache_service(temp_dir):
+    """Create a ParquetCacheService instance for testing."""
+    pytest.importorskip("pyarrow")
+    return ParquetCacheService(cache_dir=temp_dir, max_age_hours=24)
+
+
+@pytest.fixture
+def data_service(cache_service):
+    """Create a DataService instance for testing (no network calls)."""
+    return DataService(cache_service, api_base_url="http://localhost/api")
+
+
 @pytest.fixture
 def sample_user(auth_service):
     """Create a sample user for testing."""
@@ -2,10 +2,14 @@
 Tests for services/auth_service.py
 """
 
+import time
 import pytest
 from datetime import datetime, timedelta
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import sessionmaker
 
-from services.auth_service import AuthService
+from models.database import User
+from services.auth_service import AuthService, TTLCache, MIN_BCRYPT_COST, BCRYPT_MAX_ROUNDS, ARGON2
 
 
 class TestPasswordHashing:
@@ -14,7 +18,7 @@ class TestPasswordHashing:
     def test_hash_password(self):
         """Test password hashing."""
         password = "SecurePass123"
-        hashed = AuthService.hash_password(password)
+        hashed = AuthService.hash_password(password, scheme="bcrypt")
         
         assert hashed != password
         assert len(hashed) > 50  # Bcrypt hashes are long
@@ -48,6 +52,95 @@ class TestPasswordHashing:
         assert hash1 != hash2  # Different salts
         assert AuthService.verify_password(password, hash1) is True
         assert AuthService.verify_password(password, hash2) is True
+    
+    def test_hash_password_cost(self):
+        """Test the cost factor is encoded in the hash."""
+        hashed = AuthService.hash_password("SecurePass123", cost=4, scheme="bcrypt")
+        
+        assert hashed.split("$")[2] == "04"
+        assert AuthService.verify_password("SecurePass123", hashed) is True
+    
+    def test_default_cost(self):
+        """Test bcrypt hashes use the configured default cost."""
+        hashed = AuthService.hash_password("SecurePass123", scheme="bcrypt")
+        
+        assert int(hashed.split("$")[2]) == AuthService.default_cost()
+    
+    def test_verify_hash_with_other_cost(self):
+        """Test hashes made with a different cost still verify."""
+        hashed = AuthService.hash_password("SecurePass123", cost=12, scheme="bcrypt")
+        
+        assert AuthService.verify_password("SecurePass123", hashed) is True
+    
+    def test_parse_cost_clamped(self, caplog):
+        """Test out-of-range cost settings are clamped, with a warning."""
+        assert AuthService.parse_cost(" 12 ") == 12
+        assert AuthService.parse_cost("4") == MIN_BCRYPT_COST
+        assert AuthService.parse_cost("40") == BCRYPT_MAX_ROUNDS
+        assert len(caplog.records) == 2
+    
+    def test_parse_cost_invalid(self, caplog):
+        """Test a non-integer cost setting falls back to the minimum."""
+        assert AuthService.parse_cost("high") == MIN_BCRYPT_COST
+        assert "AUTH_BCRYPT_COST" in caplog.text
+    
+    def test_calibrate_cost_floor(self):
+        """Test calibration never goes below the minimum cost."""
+        assert AuthService.calibrate_cost(target_ms=1) == MIN_BCRYPT_COST
+    
+    def test_service_cost(self, db_session):
+        """Test a service-level cost is used for stored hashes."""
+        service = AuthService(db_session, bcrypt_cost=4, scheme="bcrypt")
+        user, temp_password = service.create_user(email="cost@example.com", name="Cost User")
+        
+        assert user.password_hash.split("$")[2] == "04"
+        assert AuthService.verify_password(temp_password, user.password_hash) is True
+
+
+@pytest.mark.skipif(ARGON2 is None, reason="argon2-cffi not installed")
+class TestArgon2Hashing:
+    """Tests for Argon2id hashing and migration from bcrypt."""
+    
+    def test_hash_password_argon2id(self):
+        """Test Argon2id hashes are produced and verified."""
+        hashed = AuthService.hash_password("SecurePass123", scheme="argon2id")
+        
+        assert hashed.startswith("$argon2id$")
+        assert AuthService.verify_password("SecurePass123", hashed) is True
+        assert AuthService.verify_password("WrongPass456", hashed) is False
+    
+    def test_needs_rehash(self):
+        """Test bcrypt hashes are flagged for upgrade, Argon2id ones are not."""
+        bcrypt_hash = AuthService.hash_password("SecurePass123", cost=4, scheme="bcrypt")
+        argon_hash = AuthService.hash_password("SecurePass123", scheme="argon2id")
+        
+        assert AuthService.needs_rehash(bcrypt_hash, "argon2id") is True
+        assert AuthService.needs_rehash(argon_hash, "argon2id") is False
+        assert AuthService.needs_rehash(argon_hash, "bcrypt") is False
+    
+    def test_login_upgrades_bcrypt_hash(self, db_session):
+        """Test a successful login rewrites a legacy bcrypt hash as Argon2id."""
+        legacy = AuthService(db_session, bcrypt_cost=4, scheme="bcrypt")
+        legacy.create_user(email="legacy@example.com", name="Legacy", password="LegacyPass1")
+        
+        service = AuthService(db_session, scheme="argon2id")
+        success, user, _ = service.authenticate("legacy@example.com", "LegacyPass1")
+        
+        assert success is True
+        assert user.password_hash.startswith("$argon2id$")
+        assert service.authenticate("legacy@example.com", "LegacyPass1")[0] is True
+    
+    def test_failed_login_keeps_hash(self, db_session):
+        """Test a failed login does not touch the stored hash."""
+        legacy = AuthService(db_session, bcrypt_cost=4, scheme="bcrypt")
+        user, _ = legacy.create_user(email="keep@example.com", name="Keep", password="KeepPass12")
+        original = user.password_hash
+        
+        service = AuthService(db_session, scheme="argon2id")
+        success, _, _ = service.authenticate("keep@example.com", "WrongPass99")
+        
+        assert success is False
+        assert user.password_hash == original
 
 
 class TestGenerateTempPassword:
@@ -163,6 +256,52 @@ class TestUserCreation:
         )
         
         assert user.role == "admin"
+    
+    def test_create_users_bulk(self, auth_service):
+        """Test creating several users in one call."""
+        created = auth_service.create_users_bulk([
+            {"email": "bulk1@example.com", "name": "Bulk One"},
+            {"email": "bulk2@example.com", "name": "Bulk Two", "role": "admin", "password": "Pass2"},
+        ])
+        
+        assert [user.email for user, _ in created] == ["bulk1@example.com", "bulk2@example.com"]
+        assert created[0][0].must_change_password is True
+        assert created[1][0].role == "admin"
+        assert created[1][1] == "Pass2"
+        
+        success, _, _ = auth_service.authenticate("bulk1@example.com", created[0][1])
+        assert success is True
+
+
+class TestBatch:
+    """Tests for grouping changes into one transaction."""
+    
+    def test_batch_commits_once(self, auth_service, db_session):
+        """Test that changes inside batch() share a single commit."""
+        commits = []
+        event.listen(db_session, "after_commit", lambda session: commits.append(1))
+        
+        with auth_service.batch():
+            user, _ = auth_service.create_user("b1@example.com", "B1", password="Pass1")
+            auth_service.update_user_role(user, "admin")
+            auth_service.create_user("b2@example.com", "B2", password="Pass2")
+            assert commits == []
+        
+        assert len(commits) == 1
+        assert auth_service.get_user_by_email("b1@example.com").role == "admin"
+    
+    def test_batch_rolls_back_on_error(self, auth_service):
+        """Test that an exception inside batch() discards its changes."""
+        with pytest.raises(RuntimeError):
+            with auth_service.batch():
+                auth_service.create_user("gone@example.com", "Gone", password="Pass1")
+                raise RuntimeError("boom")
+        
+        assert auth_service.get_user_by_email("gone@example.com") is None
+        
+        # Autocommit is restored afterwards
+        auth_service.create_user("kept@example.com", "Kept", password="Pass1")
+        assert auth_service.get_user_by_email("kept@example.com") is not None
 
 
 class TestPasswordChange:
@@ -267,7 +406,7 @@ class TestSessionManagement:
         token = auth_service.create_session(user)
         
         assert token is not None
-        assert user.session_token == token
+        assert user.session_token == AuthService.hash_session_token(token)
         assert user.session_expires is not None
         assert user.session_expires > datetime.utcnow()
     
@@ -281,6 +420,15 @@ class TestSessionManagement:
         assert validated_user is not None
         assert validated_user.id == user.id
     
+    def test_raw_token_not_stored(self, auth_service, sample_user):
+        """Test only the token's hash is stored, so the stored value can't log in."""
+        user, _ = sample_user
+        token = auth_service.create_session(user)
+        
+        assert user.session_token != token
+        assert len(user.session_token) == 64
+        assert auth_service.validate_session(user.session_token) is None
+    
     def test_validate_session_invalid_token(self, auth_service):
         """Test validation of invalid token."""
         validated_user = auth_service.validate_session("invalid_token_xyz")
@@ -312,6 +460,190 @@ class TestSessionManagement:
         # Token should no longer be valid
         validated_user = auth_service.validate_session(token)
         assert validated_user is None
+    
+    def test_validate_session_expired(self, auth_service, sample_user):
+        """Test an expired session is rejected."""
+        user, _ = sample_user
+        token = auth_service.create_session(user)
+        user.session_expires = datetime.utcnow() - timedelta(minutes=1)
+        auth_service.db.commit()
+        
+        assert auth_service.validate_session(token) is None
+    
+    def test_validate_session_inactive_user(self, auth_service, sample_user):
+        """Test a deactivated user's session is rejected."""
+        user, _ = sample_user
+        token = auth_service.create_session(user)
+        auth_service.deactivate_user(user)
+        
+        assert auth_service.validate_session(token) is None
+    
+    def test_purge_expired_sessions(self, auth_service, sample_user, admin_user):
+        """Test expired tokens are cleared in bulk and live ones kept."""
+        user, _ = sample_user
+        admin, _ = admin_user
+        auth_service.create_session(user)
+        live_token = auth_service.create_session(admin)
+        user.session_expires = datetime.utcnow() - timedelta(minutes=1)
+        auth_service.db.commit()
+        
+        assert auth_service.purge_expired_sessions() == 1
+        assert user.session_token is None
+        assert admin.session_token == AuthService.hash_session_token(live_token)
+
+
+class TestUserCache:
+    """Tests for the in-process user cache."""
+    
+    @pytest.fixture(autouse=True)
+    def enable_cache(self, monkeypatch):
+        """The cache is opt-in; turn it on for these tests."""
+        monkeypatch.setattr(AuthService._user_by_email_cache, 'ttl', 60)
+        monkeypatch.setattr(AuthService._user_by_token_cache, 'ttl', 60)
+    
+    @staticmethod
+    def count_queries(session):
+        """Attach a SELECT counter to the session's engine."""
+        counter = {'selects': 0}
+        
+        def before_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                counter['selects'] += 1
+        
+        event.listen(session.get_bind(), "before_cursor_execute", before_execute)
+        return counter
+    
+    def test_get_user_by_email_cached(self, db_session, sample_user):
+        """Test a second lookup from a new session runs no query."""
+        user, _ = sample_user
+        AuthService(db_session).get_user_by_email(user.email)
+        
+        other_session = sessionmaker(bind=db_session.get_bind())()
+        counter = self.count_queries(other_session)
+        cached = AuthService(other_session).get_user_by_email(user.email)
+        
+        assert counter['selects'] == 0
+        assert cached.id == user.id
+        assert cached in other_session
+        other_session.close()
+    
+    def test_validate_session_cached(self, db_session, sample_user):
+        """Test a validated token is served from the cache."""
+        user, _ = sample_user
+        token = AuthService(db_session).create_session(user)
+        AuthService(db_session).validate_session(token)
+        
+        other_session = sessionmaker(bind=db_session.get_bind())()
+        counter = self.count_queries(other_session)
+        validated = AuthService(other_session).validate_session(token)
+        
+        assert counter['selects'] == 0
+        assert validated.email == user.email
+        other_session.close()
+    
+    def test_role_change_invalidates(self, auth_service, sample_user):
+        """Test changes made through the service are visible immediately."""
+        user, _ = sample_user
+        auth_service.get_user_by_email(user.email)
+        
+        auth_service.update_user_role(user, 'admin')
+        
+        other_session = sessionmaker(bind=auth_service.db.get_bind())()
+        assert AuthService(other_session).get_user_by_email(user.email).role == 'admin'
+        other_session.close()
+    
+    def test_logout_invalidates_token(self, auth_service, sample_user):
+        """Test a logged-out token is not served from the cache."""
+        user, _ = sample_user
+        token = auth_service.create_session(user)
+        auth_service.validate_session(token)
+        
+        auth_service.invalidate_session(user)
+        
+        other_session = sessionmaker(bind=auth_service.db.get_bind())()
+        assert AuthService(other_session).validate_session(token) is None
+        other_session.close()
+    
+    def test_validate_session_skips_password_hash(self, db_session, sample_user):
+        """Test session lookups leave the password hash unloaded until used."""
+        user, _ = sample_user
+        token = AuthService(db_session).create_session(user)
+        
+        for _ in range(2):  # DB row, then cached row
+            other_session = sessionmaker(bind=db_session.get_bind())()
+            validated = AuthService(other_session).validate_session(token)
+            
+            assert 'password_hash' in sa_inspect(validated).unloaded
+            assert validated.name == user.name
+            assert validated.password_hash == user.password_hash
+            other_session.close()
+        
+        # No cached row carries the password hash
+        token_hash = AuthService.hash_session_token(token)
+        assert 'password_hash' not in AuthService._user_by_token_cache.get(token_hash)
+        assert 'password_hash' not in AuthService._user_by_email_cache.get(user.email)
+    
+    def test_authenticate_reads_current_row(self, db_session, sample_user):
+        """Test a password and active flag changed outside the service apply at once."""
+        user, password = sample_user
+        AuthService(db_session).get_user_by_email(user.email)
+        
+        # Change the row behind the cache's back, as another process would
+        other_session = sessionmaker(bind=db_session.get_bind())()
+        other = other_session.query(User).filter_by(email=user.email).one()
+        other.password_hash = AuthService.hash_password('NewPassword456!')
+        other_session.commit()
+        other_session.close()
+        
+        success, _, _ = AuthService(db_session).authenticate(user.email, password)
+        assert success is False
+        success, _, _ = AuthService(db_session).authenticate(user.email, 'NewPassword456!')
+        assert success is True
+    
+    def test_expired_cached_session_rejected(self, auth_service, sample_user):
+        """Test an expired session is rejected even when cached."""
+        user, _ = sample_user
+        token = auth_service.create_session(user)
+        auth_service.validate_session(token)
+        
+        # Expire the session behind the cache's back
+        snapshot = AuthService._user_by_token_cache.get(AuthService.hash_session_token(token))
+        snapshot['session_expires'] = datetime.utcnow() - timedelta(seconds=1)
+        user.session_expires = snapshot['session_expires']
+        auth_service.db.commit()
+        
+        assert auth_service.validate_session(token) is None
+
+
+class TestTTLCache:
+    """Tests for the TTLCache helper."""
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+    
+    def test_expiry(self):
+        """Test entries expire after ttl."""
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        
+        assert cache.get('a') is None
+    
+    def test_disabled(self):
+        """Test ttl=0 disables caching."""
+        cache = TTLCache(maxsize=2, ttl=0)
+        cache.set('a', 1)
+        
+        assert cache.get('a') is None
 
 
 class TestGetAllUsers:
@@ -7,7 +7,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 
-from services.cache_service import SQLiteCacheService
+from services.cache_service import SQLiteCacheService, ParquetCacheService, create_cache_service
 
 
 class TestSQLiteCacheService:
@@ -101,6 +101,47 @@ class TestSQLiteCacheService:
         # Verify it's gone
         assert cache_service.get('clear_key') is None
     
+    def test_reuses_connection(self, cache_service):
+        """Test that one connection per key is kept open and reused."""
+        cache_service.set('conn_key', pd.DataFrame({'id': [1]}))
+        conn = cache_service._conns['conn_key']
+        
+        cache_service.get('conn_key')
+        cache_service.get_age_hours('conn_key')
+        
+        assert cache_service._conns['conn_key'] is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    
+    def test_clear_closes_connection(self, cache_service, temp_dir):
+        """Test that clearing removes the connection and WAL side files."""
+        cache_service.set('wal_key', pd.DataFrame({'id': [1]}))
+        cache_service.clear('wal_key')
+        
+        assert 'wal_key' not in cache_service._conns
+        assert list(temp_dir.glob('wal_key_cache.db*')) == []
+        
+        # The key can be written again afterwards
+        cache_service.set('wal_key', pd.DataFrame({'id': [2]}))
+        assert cache_service.get('wal_key')['id'].iloc[0] == 2
+    
+    def test_exit_hook_does_not_keep_instances_alive(self, temp_dir):
+        """Test that discarded services are collected and live ones closed at exit."""
+        import gc
+        import weakref
+        from services import cache_service as module
+        
+        discarded = SQLiteCacheService(cache_dir=temp_dir, max_age_hours=1)
+        discarded.set('gone_key', pd.DataFrame({'id': [1]}))
+        ref = weakref.ref(discarded)
+        del discarded
+        gc.collect()
+        assert ref() is None
+        
+        live = SQLiteCacheService(cache_dir=temp_dir, max_age_hours=1)
+        live.set('live_key', pd.DataFrame({'id': [1]}))
+        module._close_sqlite_caches()
+        assert live._conns == {}
+    
     def test_clear_nonexistent(self, cache_service):
         """Test clearing nonexistent cache (should not error)."""
         cache_service.clear('nonexistent')  # Should not raise
@@ -151,3 +192,81 @@ class TestSQLiteCacheService:
         assert result['name'].iloc[0] == 'קרן פנסיה'
         assert 'quotes' in result['name'].iloc[1]
 
+
+
+class TestParquetCacheService:
+    """Tests for ParquetCacheService."""
+    
+    def test_set_and_get(self, parquet_cache_service):
+        """Test basic set and get operations."""
+        data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['A', 'B', 'C'],
+            'value': [1.1, 2.2, 3.3]
+        })
+        
+        parquet_cache_service.set('test_key', data)
+        retrieved = parquet_cache_service.get('test_key')
+        
+        pd.testing.assert_frame_equal(retrieved, data)
+    
+    def test_get_nonexistent_key(self, parquet_cache_service):
+        """Test getting a key that doesn't exist."""
+        assert parquet_cache_service.get('nonexistent_key') is None
+    
+    def test_overwrite_cache(self, parquet_cache_service):
+        """Test overwriting existing cache."""
+        parquet_cache_service.set('overwrite_key', pd.DataFrame({'id': [1, 2]}))
+        parquet_cache_service.set('overwrite_key', pd.DataFrame({'id': [3, 4, 5]}))
+        
+        result = parquet_cache_service.get('overwrite_key')
+        
+        assert list(result['id']) == [3, 4, 5]
+    
+    def test_dtypes_preserved(self, parquet_cache_service):
+        """Test datetime, float and categorical columns round-trip as-is."""
+        data = pd.DataFrame({
+            'REPORT_DATE': pd.to_datetime(['2023-01-01', '2023-02-01']),
+            'TRAILING_3M_YIELD': [1.25, float('nan')],
+            'FUND_CLASSIFICATION': pd.Categorical(['General', 'Conservative'])
+        })
+        
+        parquet_cache_service.set('dtype_key', data)
+        result = parquet_cache_service.get('dtype_key')
+        
+        assert pd.api.types.is_datetime64_any_dtype(result['REPORT_DATE'])
+        assert result['TRAILING_3M_YIELD'].dtype == 'float64'
+        assert isinstance(result['FUND_CLASSIFICATION'].dtype, pd.CategoricalDtype)
+    
+    def test_age_and_validity(self, parquet_cache_service):
+        """Test cache age and validity checks."""
+        parquet_cache_service.set('age_key', pd.DataFrame({'id': [1]}))
+        
+        assert parquet_cache_service.get_age_hours('age_key') < 1.0
+        assert parquet_cache_service.is_valid('age_key') is True
+        assert parquet_cache_service.get_age_hours('nonexistent') is None
+        assert parquet_cache_service.is_valid('nonexistent') is False
+    
+    def test_clear_cache(self, parquet_cache_service):
+        """Test clearing cache."""
+        parquet_cache_service.set('clear_key', pd.DataFrame({'id': [1]}))
+        
+        parquet_cache_service.clear('clear_key')
+        
+        assert parquet_cache_service.get('clear_key') is None
+        parquet_cache_service.clear('nonexistent')  # Should not raise
+    
+    def test_failed_write_keeps_previous(self, parquet_cache_service):
+        """Test a failed write leaves the previous cache and no temp file."""
+        parquet_cache_service.set('keep_key', pd.DataFrame({'id': [1]}))
+        
+        parquet_cache_service.set('keep_key', pd.DataFrame({'mixed': [1, 'a']}))
+        
+        assert list(parquet_cache_service.get('keep_key')['id']) == [1]
+        assert not list(parquet_cache_service.cache_dir.glob('*.tmp'))
+    
+    def test_create_cache_service(self, temp_dir):
+        """Test the factory prefers Parquet when pyarrow is installed."""
+        pytest.importorskip("pyarrow")
+        
+        assert isinstance(create_cache_service(temp_dir), ParquetCacheService)
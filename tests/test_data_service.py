@@ -0,0 +1,310 @@
+"""
+Tests for services/data_service.py
+"""
+
+import json
+import pytest
+import numpy as np
+import pandas as pd
+
+from models.dataset import Dataset
+
+
+def compound(yields):
+    """Reference compounded yield: (1 + r1/100) * ... - 1, in percent."""
+    product = 1.0
+    for y in yields:
+        product *= (1 + y / 100)
+    return round((product - 1) * 100, 2)
+
+
+class TestComputeTrailingYields:
+    """Tests for DataService._compute_trailing_yields."""
+    
+    def test_matches_compounded_product(self, data_service, sample_fund_data):
+        """Test trailing yields equal the compounded monthly yields per fund."""
+        result = data_service._compute_trailing_yields(sample_fund_data)
+        
+        for fund_id, fund_df in result.groupby('FUND_ID'):
+            yields = fund_df['MONTHLY_YIELD'].tolist()
+            for i, (_, row) in enumerate(fund_df.iterrows()):
+                for col, window in (('TRAILING_3M_YIELD', 3), ('TRAILING_6M_YIELD', 6), ('TRAILING_1Y_YIELD', 12)):
+                    if i + 1 < window:
+                        assert pd.isna(row[col])
+                    else:
+                        assert row[col] == pytest.approx(compound(yields[i + 1 - window:i + 1]), abs=0.01)
+    
+    def test_unsorted_input(self, data_service, sample_fund_data):
+        """Test that row order does not change the result."""
+        expected = data_service._compute_trailing_yields(sample_fund_data)
+        shuffled = sample_fund_data.sample(frac=1, random_state=0)
+        result = data_service._compute_trailing_yields(shuffled)
+        
+        pd.testing.assert_frame_equal(result, expected)
+    
+    def test_missing_month_blanks_window(self, data_service, sample_fund_data):
+        """Test that a missing monthly yield blanks every window containing it."""
+        df = sample_fund_data.copy()
+        fund_rows = df.index[df['FUND_ID'] == 1001]
+        df.loc[fund_rows[5], 'MONTHLY_YIELD'] = np.nan
+        
+        result = data_service._compute_trailing_yields(df)
+        fund = result[result['FUND_ID'] == 1001].reset_index(drop=True)
+        
+        assert fund.loc[5:7, 'TRAILING_3M_YIELD'].isna().all()
+        assert fund.loc[8, 'TRAILING_3M_YIELD'] == pytest.approx(compound(fund.loc[6:8, 'MONTHLY_YIELD']), abs=0.01)
+        assert fund.loc[5:16, 'TRAILING_1Y_YIELD'].isna().all()
+        assert fund.loc[17:, 'TRAILING_1Y_YIELD'].notna().all()
+    
+    def test_output_is_float(self, data_service, sample_fund_data):
+        """Test trailing yield columns are numeric, not object."""
+        result = data_service._compute_trailing_yields(sample_fund_data)
+        
+        for col in ('TRAILING_3M_YIELD', 'TRAILING_6M_YIELD', 'TRAILING_1Y_YIELD'):
+            assert result[col].dtype == np.float64
+        assert '_LOG_RETURN' not in result.columns
+    
+    def test_missing_columns_passthrough(self, data_service):
+        """Test frames without the needed columns are returned unchanged."""
+        df = pd.DataFrame({'FUND_ID': [1, 2]})
+        
+        result = data_service._compute_trailing_yields(df)
+        
+        assert list(result.columns) == ['FUND_ID']
+
+
+class FakeResponse:
+    """Minimal stand-in for a requests response."""
+    
+    def __init__(self, payload):
+        self.payload = payload
+        self.content = json.dumps(payload).encode()
+    
+    def json(self):
+        return self.payload
+
+
+class TestFetchResource:
+    """Tests for DataService._fetch_resource pagination."""
+    
+    def make_get(self, total, fail_offsets=()):
+        """Build a fake session.get serving `total` numbered records."""
+        calls = []
+        
+        def fake_get(url, params, timeout):
+            offset, limit = params['offset'], params['limit']
+            calls.append(offset)
+            if offset in fail_offsets:
+                return FakeResponse({'success': False, 'error': 'boom'})
+            records = [{'n': i} for i in range(offset, min(offset + limit, total))]
+            return FakeResponse({'success': True, 'result': {'records': records, 'total': total}})
+        
+        return fake_get, calls
+    
+    def test_fetches_all_pages_in_order(self, data_service, monkeypatch):
+        """Test every page is fetched once and records keep offset order."""
+        data_service.batch_size = 10
+        fake_get, calls = self.make_get(total=95)
+        monkeypatch.setattr(data_service._session, 'get', fake_get)
+        
+        records = data_service._fetch_resource('res')
+        
+        assert [r['n'] for r in records] == list(range(95))
+        assert sorted(calls) == list(range(0, 95, 10))
+    
+    def test_single_page(self, data_service, monkeypatch):
+        """Test a resource that fits in one page makes one request."""
+        data_service.batch_size = 100
+        fake_get, calls = self.make_get(total=42)
+        monkeypatch.setattr(data_service._session, 'get', fake_get)
+        
+        records = data_service._fetch_resource('res')
+        
+        assert len(records) == 42
+        assert calls == [0]
+    
+    def test_stops_at_failed_page(self, data_service, monkeypatch):
+        """Test records after a failed page are not returned out of order."""
+        data_service.batch_size = 10
+        fake_get, _ = self.make_get(total=50, fail_offsets={30})
+        monkeypatch.setattr(data_service._session, 'get', fake_get)
+        
+        records = data_service._fetch_resource('res')
+        
+        assert [r['n'] for r in records] == list(range(30))
+    
+    def test_fetch_from_api_combines_resources(self, data_service, monkeypatch):
+        """Test pages from every resource end up in one frame."""
+        data_service.batch_size = 10
+        fake_get, calls = self.make_get(total=25)
+        monkeypatch.setattr(data_service._session, 'get', fake_get)
+        monkeypatch.setattr(data_service, '_process_data', lambda df, dataset: df)
+        dataset = Dataset(key='test', name='Test', name_heb='Test', resource_ids=['r1', 'r2'])
+        
+        df = data_service._fetch_from_api(dataset)
+        
+        assert list(df['n']) == list(range(25)) * 2
+        assert len(calls) == 6
+    
+    def test_first_page_error(self, data_service, monkeypatch):
+        """Test an API error on the first page returns no records."""
+        fake_get, _ = self.make_get(total=50, fail_offsets={0})
+        monkeypatch.setattr(data_service._session, 'get', fake_get)
+        
+        assert data_service._fetch_resource('res') == []
+
+
+class TestRecordsToFrame:
+    """Tests for DataService._records_to_frame."""
+    
+    def test_matches_pandas(self, data_service):
+        """Test the Arrow path builds the same frame pandas would."""
+        records = [
+            {'FUND_ID': 1, 'FUND_NAME': 'A', 'MONTHLY_YIELD': 1.5},
+            {'FUND_ID': 2, 'FUND_NAME': 'B', 'MONTHLY_YIELD': None},
+        ]
+        
+        result = data_service._records_to_frame(records)
+        
+        pd.testing.assert_frame_equal(result, pd.DataFrame(records))
+    
+    def test_mixed_types_fallback(self, data_service):
+        """Test a mixed-type column falls back to pandas inference."""
+        records = [{'VALUE': 1}, {'VALUE': 'n/a'}]
+        
+        result = data_service._records_to_frame(records)
+        
+        assert list(result['VALUE']) == [1, 'n/a']
+    
+    def test_empty(self, data_service):
+        """Test no records gives an empty frame."""
+        assert data_service._records_to_frame([]).empty
+    
+    def test_pages_unify_column_types(self, data_service):
+        """Test a column that is all-null or int on one page keeps a float dtype."""
+        pages = [
+            [{'FUND_ID': 1, 'MONTHLY_YIELD': None}],
+            [{'FUND_ID': 2, 'MONTHLY_YIELD': 1}],
+            [{'FUND_ID': 3, 'MONTHLY_YIELD': 1.5, 'EXTRA': 'x'}],
+        ]
+        
+        result = data_service._pages_to_frame(pages)
+        
+        assert list(result['FUND_ID']) == [1, 2, 3]
+        assert result['MONTHLY_YIELD'].dtype == np.float64
+        assert result['EXTRA'].isna().sum() == 2
+    
+    def test_pages_mixed_types_fallback(self, data_service):
+        """Test a type clash between pages falls back to pandas inference."""
+        pages = [[{'VALUE': 1}], [{'VALUE': 'n/a'}]]
+        
+        result = data_service._pages_to_frame(pages)
+        
+        assert list(result['VALUE']) == [1, 'n/a']
+
+
+class TestProcessData:
+    """Tests for DataService._process_data."""
+    
+    def test_filters_and_name_fixes(self, data_service):
+        """Test dataset filter, IRA removal, name fixes and dedupe together."""
+        dataset = Dataset(
+            key='test', name='Test', name_heb='בדיקה', resource_ids=[],
+            filter={'FUND_CLASSIFICATION': ['General']}
+        )
+        df = pd.DataFrame({
+            'FUND_ID': [1, 1, 2, 3, 4],
+            'REPORT_PERIOD': [202301, 202301, 202301, 202301, 202301],
+            'FUND_NAME': ['S1;P500 Fund', 'S1;P500 Fund', 'A&amp;B Fund', 'Fund בניהול אישי', 'Other'],
+            'FUND_CLASSIFICATION': ['General', 'General', 'General', 'General', 'Special'],
+            'MONTHLY_YIELD': [1.0, 1.0, 2.0, 3.0, 4.0],
+        })
+        
+        result = data_service._process_data(df, dataset)
+        
+        assert list(result['FUND_ID']) == [1, 2]
+        assert list(result['FUND_NAME']) == ['S&P500 Fund', 'A&B Fund']
+        assert 'REPORT_DATE' in result.columns
+
+
+class TestConvertExposure:
+    """Tests for DataService._convert_exposure_to_percentage."""
+    
+    def test_absolute_values_converted(self, data_service):
+        """Test absolute exposures become percentages of total assets."""
+        df = pd.DataFrame({
+            'TOTAL_ASSETS': [1000.0, 2000.0],
+            'STOCK_MARKET_EXPOSURE': [500.0, 300.0],
+            'FOREIGN_EXPOSURE': [10.0, 20.0],
+        })
+        
+        result = data_service._convert_exposure_to_percentage(df)
+        
+        assert list(result['STOCK_MARKET_EXPOSURE']) == [50.0, 15.0]
+        assert list(result['FOREIGN_EXPOSURE']) == [10.0, 20.0]  # already percent
+    
+    def test_missing_values(self, data_service):
+        """Test NaN exposures and totals stay NaN without breaking detection."""
+        df = pd.DataFrame({
+            'TOTAL_ASSETS': [1000.0, np.nan],
+            'STOCK_MARKET_EXPOSURE': [np.nan, 300.0],
+            'FOREIGN_EXPOSURE': [np.nan, np.nan],
+        })
+        
+        result = data_service._convert_exposure_to_percentage(df)
+        
+        assert result['STOCK_MARKET_EXPOSURE'].isna().all()
+        assert result['FOREIGN_EXPOSURE'].isna().all()
+
+
+class TestShrinkDtypes:
+    """Tests for DataService._shrink_dtypes."""
+    
+    def test_shrinks_columns(self, data_service):
+        """Test display-only ratios, integers and repeated strings get compact dtypes."""
+        df = pd.DataFrame({
+            'FUND_ID': [1001, 1001, 1002, 1002],
+            'FUND_NAME': ['Fund A', 'Fund A', 'Fund B', 'Fund B'],
+            'MONTHLY_YIELD': [0.53, -1.25, 0.1, 2.0],
+            'STOCK_MARKET_EXPOSURE': [40.5, 41.0, 60.25, 59.75],
+            'SHARPE_RATIO': [1.2, 1.25, 0.8, 0.85],
+            'TOTAL_ASSETS': [123456.78, 123500.12, 98765.43, 98800.01],
+            'REPORT_DATE': pd.to_datetime(['2024-01-01', '2024-02-01'] * 2),
+        })
+        
+        result = data_service._shrink_dtypes(df.copy())
+        
+        assert result['FUND_ID'].dtype == np.int32
+        assert isinstance(result['FUND_NAME'].dtype, pd.CategoricalDtype)
+        assert result['SHARPE_RATIO'].dtype == np.float32
+        assert result['TOTAL_ASSETS'].dtype == np.float64
+        assert result['REPORT_DATE'].dtype == df['REPORT_DATE'].dtype
+        assert result['SHARPE_RATIO'].round(2).tolist() == pytest.approx([1.2, 1.25, 0.8, 0.85])
+        
+        # Columns used in yield maths, filters and thresholds keep full precision
+        assert result['MONTHLY_YIELD'].dtype == np.float64
+        assert result['STOCK_MARKET_EXPOSURE'].dtype == np.float64
+        assert (result['STOCK_MARKET_EXPOSURE'] == df['STOCK_MARKET_EXPOSURE']).all()
+    
+    def test_keeps_unique_strings_and_wide_ints(self, data_service):
+        """Test mostly-unique strings and out-of-range integers are left alone."""
+        df = pd.DataFrame({
+            'NOTE': ['a', 'b', 'c', 'd'],
+            'BIG': [2**40, 1, 2, 3],
+        })
+        
+        result = data_service._shrink_dtypes(df.copy())
+        
+        assert not isinstance(result['NOTE'].dtype, pd.CategoricalDtype)
+        assert result['BIG'].dtype == np.int64
+    
+    def test_get_data_caches_shrunk_frame(self, data_service, monkeypatch):
+        """Test the fetched frame is shrunk before it is cached."""
+        df = pd.DataFrame({'FUND_ID': [1, 2], 'SHARPE_RATIO': [0.5, 1.5]})
+        monkeypatch.setattr(data_service, '_fetch_from_api', lambda dataset: df)
+        dataset = Dataset(key='shrink', name='Shrink', name_heb='Shrink', resource_ids=['r'])
+        
+        result = data_service.get_data(dataset, force_refresh=True)
+        
+        assert result['SHARPE_RATIO'].dtype == np.float32
+        assert data_service.cache.get('shrink')['FUND_ID'].tolist() == [1, 2]
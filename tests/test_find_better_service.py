@@ -4,8 +4,10 @@ Tests for services/find_better_service.py
 
 import pytest
 import pandas as pd
+from sqlalchemy import event
 
-from services.find_better_service import FindBetterService
+from models.database import SystemSettings, DEFAULT_THRESHOLDS
+from services.find_better_service import FindBetterService, period_window_start
 
 
 class TestThresholdManagement:
@@ -22,6 +24,16 @@ class TestThresholdManagement:
         assert 'currency_exposure_threshold' in thresholds
         assert 'liquidity_threshold' in thresholds
     
+    def test_get_all_thresholds_fields(self, find_better_service):
+        """Test each threshold carries its value, range, default and description."""
+        find_better_service.update_threshold('yield_threshold', 2.0)
+        
+        setting = find_better_service.get_all_thresholds()['yield_threshold']
+        
+        assert setting['value'] == 2.0
+        assert setting['min'] <= setting['default'] <= setting['max']
+        assert setting['description']
+    
     def test_get_threshold(self, find_better_service):
         """Test getting a specific threshold."""
         yield_threshold = find_better_service.get_threshold('yield_threshold')
@@ -42,6 +54,74 @@ class TestThresholdManagement:
         assert result is True
         assert find_better_service.get_threshold('yield_threshold') == 0.5
     
+    def test_thresholds_need_no_query(self, find_better_service, db_session):
+        """Test threshold lookups reuse the rows loaded at construction."""
+        selects = []
+        
+        def before_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+        
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        for key in ('yield_threshold', 'std_threshold', 'stock_exposure_threshold', 'yield_threshold'):
+            find_better_service.get_threshold(key)
+        event.remove(db_session.get_bind(), "before_cursor_execute", before_execute)
+        
+        assert selects == []
+    
+    def test_update_keeps_thresholds_loaded(self, find_better_service, db_session):
+        """Test an update refreshes the loaded thresholds without reloading them."""
+        find_better_service.update_threshold('yield_threshold', 0.5)
+        selects = []
+        
+        def before_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+        
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        value = find_better_service.get_threshold('yield_threshold')
+        event.remove(db_session.get_bind(), "before_cursor_execute", before_execute)
+        
+        assert value == 0.5
+        assert selects == []
+    
+    def test_get_thresholds(self, find_better_service):
+        """Test fetching several thresholds at once, with fallbacks."""
+        find_better_service.update_threshold('yield_threshold', 0.5)
+        
+        thresholds = find_better_service.get_thresholds(['yield_threshold', 'nonexistent_key'])
+        
+        assert thresholds == {'yield_threshold': 0.5, 'nonexistent_key': 0.0}
+    
+    def test_init_reads_settings_once(self, find_better_service, db_session):
+        """Test constructing the service loads all settings with one SELECT."""
+        selects = []
+        
+        def before_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+        
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        FindBetterService(db_session)
+        event.remove(db_session.get_bind(), "before_cursor_execute", before_execute)
+        
+        assert len(selects) == 1
+    
+    def test_init_inserts_defaults_at_once(self, db_session):
+        """Test a fresh database gets every default setting in one INSERT."""
+        statements = []
+        
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement.lstrip().split()[0].upper())
+        
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        service = FindBetterService(db_session)
+        event.remove(db_session.get_bind(), "before_cursor_execute", before_execute)
+        
+        assert statements.count("INSERT") == 1
+        assert db_session.query(SystemSettings).count() == len(DEFAULT_THRESHOLDS)
+        assert service.get_threshold('yield_threshold') == DEFAULT_THRESHOLDS['yield_threshold']['default']
+    
     def test_update_threshold_out_of_range_low(self, find_better_service):
         """Test updating threshold below minimum."""
         result = find_better_service.update_threshold('yield_threshold', -1.0)
@@ -131,6 +211,77 @@ class TestCalculatePeriodYield:
         assert result is None
 
 
+class TestCalculatePeriodYields:
+    """Tests for calculating period yields for all funds at once."""
+    
+    def test_matches_single_fund_calculation(self, find_better_service, sample_fund_data):
+        """Test every fund's yield equals calculate_period_yield()."""
+        for period_months in (3, 12):
+            # Single-fund yields first, before the grouped result is memoized
+            expected = {
+                fund_id: find_better_service.calculate_period_yield(
+                    sample_fund_data, fund_id, period_months, 202312
+                )
+                for fund_id in sample_fund_data['FUND_ID'].unique()
+            }
+            
+            yields = find_better_service.calculate_period_yields(
+                sample_fund_data, period_months=period_months, selected_period=202312
+            )
+            
+            for fund_id, value in expected.items():
+                assert yields.get(fund_id) == value
+    
+    def test_insufficient_data_left_out(self, find_better_service, sample_fund_data):
+        """Test funds without 80% of the months get no yield."""
+        df = sample_fund_data[
+            (sample_fund_data['FUND_ID'] != 1002) | (sample_fund_data['REPORT_PERIOD'] >= 202310)
+        ]
+        
+        yields = find_better_service.calculate_period_yields(df, period_months=12, selected_period=202312)
+        
+        assert 1002 not in yields.index
+        assert 1001 in yields.index
+    
+    def test_memoized_per_frame(self, find_better_service, sample_fund_data):
+        """Test repeat calls reuse the result, and single-fund lookups read from it."""
+        yields = find_better_service.calculate_period_yields(sample_fund_data, 12, 202312)
+        
+        assert find_better_service.calculate_period_yields(sample_fund_data, 12, 202312) is yields
+        assert find_better_service.calculate_period_yield(sample_fund_data, 1001, 12, 202312) == yields[1001]
+        assert find_better_service.calculate_period_yield(sample_fund_data, 9999, 12, 202312) is None
+        
+        # A different frame is computed afresh
+        other = sample_fund_data.copy()
+        assert find_better_service.calculate_period_yields(other, 12, 202312) is not yields
+    
+    def test_window_by_report_period(self, find_better_service):
+        """Test the window covers whole months, whatever day REPORT_DATE falls on."""
+        data = pd.DataFrame({
+            'FUND_ID': [1, 1, 1, 1],
+            'REPORT_DATE': pd.to_datetime(['2023-09-30', '2023-10-31', '2023-11-30', '2023-12-31']),
+            'REPORT_PERIOD': [202309, 202310, 202311, 202312],
+            'MONTHLY_YIELD': [50.0, 1.0, 1.0, 1.0],
+        })
+        
+        yields = find_better_service.calculate_period_yields(data, period_months=3, selected_period=202312)
+        
+        assert yields[1] == round((1.01 ** 3 - 1) * 100, 2)
+    
+    def test_period_window_start(self):
+        """Test window starts across year boundaries."""
+        assert period_window_start(202312, 12) == 202301
+        assert period_window_start(202401, 3) == 202311
+        assert period_window_start(202406, 60) == 201907
+        assert period_window_start(202406, 1) == 202406
+    
+    def test_empty_dataframe(self, find_better_service):
+        """Test an empty frame gives no yields."""
+        yields = find_better_service.calculate_period_yields(pd.DataFrame(), 12, 202312)
+        
+        assert yields.empty
+
+
 class TestGetEligibleFunds:
     """Tests for getting eligible funds for comparison."""
     
@@ -179,6 +330,58 @@ class TestGetEligibleFunds:
         
         assert 'CALC_YIELD' in eligible.columns
         assert eligible['CALC_YIELD'].notna().all()
+    
+    def test_get_eligible_funds_one_row_per_fund(self, find_better_service, sample_fund_data):
+        """Test each fund's latest row is joined with its own period yield."""
+        user_fund = sample_fund_data[sample_fund_data['FUND_ID'] == 1001].iloc[0]
+        expected = {
+            fund_id: find_better_service.calculate_period_yield(sample_fund_data, fund_id, 12, 202312)
+            for fund_id in (1002, 1003)
+        }
+        
+        eligible = find_better_service.get_eligible_funds(
+            sample_fund_data,
+            user_fund,
+            period_months=12,
+            selected_period=202312
+        )
+        
+        assert eligible['FUND_ID'].tolist() == [1002, 1003]
+        assert (eligible['REPORT_PERIOD'] == 202312).all()
+        assert dict(zip(eligible['FUND_ID'], eligible['CALC_YIELD'])) == expected
+    
+    def test_get_eligible_funds_no_per_fund_pass(self, find_better_service, sample_fund_data, monkeypatch):
+        """Test yields come from the one grouped pass, never a per-fund calculation."""
+        def per_fund(*args, **kwargs):
+            raise AssertionError("calculate_period_yield called per fund")
+        monkeypatch.setattr(find_better_service, 'calculate_period_yield', per_fund)
+        user_fund = sample_fund_data[sample_fund_data['FUND_ID'] == 1001].iloc[0]
+        
+        eligible = find_better_service.get_eligible_funds(
+            sample_fund_data,
+            user_fund,
+            period_months=12,
+            selected_period=202312
+        )
+        
+        assert len(eligible) == 2
+    
+    def test_get_eligible_funds_no_candidates(self, find_better_service, sample_fund_data):
+        """Test an empty result, without computing yields, when no other fund shares the classification."""
+        user_fund = sample_fund_data[sample_fund_data['FUND_ID'] == 1004].iloc[0]
+        
+        eligible = find_better_service.get_eligible_funds(
+            sample_fund_data,
+            user_fund,
+            period_months=12,
+            selected_period=202312
+        )
+        
+        assert eligible.empty
+        assert find_better_service._yield_cache == {}
+        # Same schema as a non-empty result
+        assert list(eligible.columns) == list(sample_fund_data.columns) + ['CALC_YIELD']
+        assert eligible['MONTHLY_YIELD'].dtype == sample_fund_data['MONTHLY_YIELD'].dtype
 
 
 class TestFindUnrestrictedBetter:
@@ -263,6 +466,33 @@ class TestFindUnrestrictedBetter:
         assert len(better) <= 2
 
 
+class TestTopByYield:
+    """Tests for picking the top funds without a full sort."""
+    
+    def test_matches_full_sort_with_ties(self, find_better_service):
+        """Test ties at the cut-off are still ordered by lowest STD."""
+        df = pd.DataFrame({
+            'FUND_ID': range(8),
+            'CALC_YIELD': [5.0, 7.0, 5.0, 9.0, 5.0, 1.0, 7.0, 5.0],
+            'STANDARD_DEVIATION': [4.0, 2.0, 1.0, 3.0, 2.0, 1.0, 5.0, 3.0],
+        })
+        by, ascending = ['CALC_YIELD', 'STANDARD_DEVIATION'], [False, True]
+        
+        result = find_better_service._top_by_yield(df, 4, by, ascending)
+        
+        expected = df.sort_values(by, ascending=ascending).head(4)
+        pd.testing.assert_frame_equal(result, expected)
+        assert result['FUND_ID'].tolist() == [3, 1, 6, 2]
+    
+    def test_fewer_rows_than_top_n(self, find_better_service):
+        """Test small frames are simply sorted."""
+        df = pd.DataFrame({'CALC_YIELD': [1.0, 3.0], 'STANDARD_DEVIATION': [1.0, 1.0]})
+        
+        result = find_better_service._top_by_yield(df, 5, 'CALC_YIELD', False)
+        
+        assert result['CALC_YIELD'].tolist() == [3.0, 1.0]
+
+
 class TestFindSimilarStrategyBetter:
     """Tests for finding better funds with similar strategy."""
     
@@ -298,6 +528,36 @@ class TestFindSimilarStrategyBetter:
                     diff = abs(fund['STOCK_MARKET_EXPOSURE'] - user_stock)
                     assert diff <= stock_threshold
     
+    def test_find_similar_strategy_exposure_at_threshold(self, find_better_service):
+        """Test funds exactly at target +/- threshold are kept."""
+        threshold = find_better_service.get_threshold('stock_exposure_threshold')
+        user_fund = pd.Series({'FUND_ID': 1, 'STOCK_MARKET_EXPOSURE': 5.05})
+        eligible = pd.DataFrame({
+            'FUND_ID': [2, 3, 4],
+            'CALC_YIELD': [5.0, 5.0, 5.0],
+            'STOCK_MARKET_EXPOSURE': [5.05 + threshold, 5.05 - threshold, 5.05 + threshold + 0.01],
+        })
+        
+        better = find_better_service.find_similar_strategy_better(eligible, user_fund, 1.0, top_n=5)
+        
+        assert sorted(better['FUND_ID']) == [2, 3]
+    
+    def test_find_similar_strategy_float32_columns(self, find_better_service, sample_fund_data):
+        """Test float32 columns are compared natively and give the same funds."""
+        user_fund = sample_fund_data[
+            (sample_fund_data['FUND_ID'] == 1001) &
+            (sample_fund_data['REPORT_PERIOD'] == 202312)
+        ].iloc[0]
+        eligible = find_better_service.get_eligible_funds(sample_fund_data, user_fund, 12, 202312)
+        float_cols = eligible.select_dtypes('float64').columns
+        
+        expected = find_better_service.find_similar_strategy_better(eligible, user_fund, 0.0, top_n=5)
+        result = find_better_service.find_similar_strategy_better(
+            eligible.astype({col: 'float32' for col in float_cols}), user_fund, 0.0, top_n=5
+        )
+        
+        assert result['FUND_ID'].tolist() == expected['FUND_ID'].tolist()
+    
     def test_find_similar_strategy_respects_all_exposures(self, find_better_service, sample_fund_data):
         """Test that all exposure thresholds are checked."""
         user_fund = sample_fund_data[
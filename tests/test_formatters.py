@@ -11,7 +11,8 @@ from utils.formatters import (
     get_short_unique_name,
     format_number,
     calculate_trailing_1y_yield,
-    calculate_compounded_yield
+    calculate_compounded_yield,
+    calculate_compounded_yields
 )
 
 
@@ -172,6 +173,50 @@ class TestCalculateCompoundedYield:
         monthly_yields = pd.Series([2.0, -1.0, 1.5, 0.5, -0.5, 1.0])
         result = calculate_compounded_yield(monthly_yields, annualize=False)
         assert result is not None
+    
+    def test_missing_month_skipped(self):
+        """Test a missing monthly yield is left out of the product."""
+        monthly_yields = pd.Series([1.0, None, 1.0])
+        result = calculate_compounded_yield(monthly_yields, annualize=False)
+        assert result == round((1.01 ** 2 - 1) * 100, 2)
+    
+    def test_float32_matches_float64(self):
+        """Test float32 yields compound in float64, like the grouped version."""
+        monthly_yields = pd.Series([1.54, 2.96, 1.49, -3.41, 3.22, 1.84, -1.11, 2.24, 1.59, 1.38, 0.59, 2.14])
+        result = calculate_compounded_yield(monthly_yields.astype('float32'), annualize=False)
+        assert result == calculate_compounded_yield(monthly_yields.astype('float32').astype('float64'), annualize=False)
+
+
+class TestCalculateCompoundedYields:
+    """Tests for calculate_compounded_yields function."""
+    
+    def test_matches_single_series(self):
+        """Test each group's yield equals calculate_compounded_yield()."""
+        yields = pd.Series([2.0, -1.0, 1.5, 0.5, -0.5, 1.0, 3.0])
+        funds = pd.Series([1, 1, 2, 1, 2, 2, 3])
+        
+        result = calculate_compounded_yields(yields, funds)
+        
+        for fund_id in (1, 2, 3):
+            assert result[fund_id] == calculate_compounded_yield(yields[funds == fund_id])
+    
+    def test_min_months(self):
+        """Test groups with too few rows are left out."""
+        yields = pd.Series([1.0, 1.0, 1.0, 2.0])
+        funds = pd.Series([1, 1, 1, 2])
+        
+        result = calculate_compounded_yields(yields, funds, min_months=2)
+        
+        assert list(result.index) == [1]
+    
+    def test_float32_input(self):
+        """Test float32 yields compound in double precision."""
+        yields = pd.Series([0.53] * 12)
+        funds = pd.Series([1] * 12)
+        
+        result = calculate_compounded_yields(yields.astype('float32'), funds)
+        
+        assert result[1] == calculate_compounded_yield(yields)
 
 
 class TestCalculateTrailing1YYield:
@@ -103,7 +103,7 @@ def render_charts(df: pd.DataFrame) -> None:
         col5, col6 = st.columns(2)
         
         with col5:
-            class_stats = df.groupby('FUND_CLASSIFICATION').agg({
+            class_stats = df.groupby('FUND_CLASSIFICATION', observed=True).agg({
                 'FUND_ID': 'count',
                 'TOTAL_ASSETS': 'sum',
                 'MONTHLY_YIELD': 'mean'
@@ -2,6 +2,7 @@
 Formatting utilities for dates, numbers, and display values.
 """
 
+import numpy as np
 import pandas as pd
 from typing import List, Optional
 
@@ -120,11 +121,12 @@ def calculate_compounded_yield(monthly_yields: pd.Series, annualize: bool = Fals
     if monthly_yields.empty:
         return None
     
-    # Convert percentages to growth factors (e.g., 1% -> 1.01)
-    growth_factors = 1 + (monthly_yields / 100)
+    # Convert percentages to growth factors (e.g., 1% -> 1.01), on the raw
+    # float64 array: no intermediate Series for a single fund's few months
+    growth_factors = 1 + monthly_yields.to_numpy(dtype=np.float64, na_value=np.nan) / 100
     
-    # Calculate cumulative growth (product of all factors)
-    cumulative_growth = growth_factors.prod()
+    # Calculate cumulative growth (product of all factors; missing months skipped)
+    cumulative_growth = np.nanprod(growth_factors)
     
     if annualize:
         # Annualize to 12 months
@@ -138,6 +140,28 @@ def calculate_compounded_yield(monthly_yields: pd.Series, annualize: bool = Fals
     return round(annual_yield, 2)
 
 
+def calculate_compounded_yields(monthly_yields: pd.Series, by: pd.Series, min_months: int = 1) -> pd.Series:
+    """
+    Calculate cumulative compounded yield per group (e.g. per fund).
+    
+    Same result as calculate_compounded_yield() on each group, computed with
+    one grouped product instead of a Python call per group.
+    
+    Args:
+        monthly_yields: Series of monthly yield percentages
+        by: Group key for each row (e.g. FUND_ID)
+        min_months: Groups with fewer rows are left out
+        
+    Returns:
+        Series of compounded yield percentages indexed by group key
+    """
+    # float64 so float32-cached yields compound without extra rounding error
+    growth = (1 + monthly_yields.astype('float64') / 100).groupby(by, sort=False)
+    months = growth.size()
+    yields = ((growth.prod() - 1) * 100).round(2)
+    return yields[months >= min_months]
+
+
 def calculate_trailing_1y_yield(period_df: pd.DataFrame, all_df: pd.DataFrame, selected_period: int) -> pd.DataFrame:
     """
     Calculate trailing 12-month COMPOUNDED yield for each fund.
@@ -170,15 +194,10 @@ def calculate_trailing_1y_yield(period_df: pd.DataFrame, all_df: pd.DataFrame, s
     
     # Calculate compounded annual yield for each fund
     if 'MONTHLY_YIELD' in historical.columns:
-        # Group by fund and calculate compounded yield
-        ttm_yields = {}
-        
-        for fund_id, group in historical.groupby('FUND_ID'):
-            # Only use if we have at least 6 months of data
-            if len(group) >= 6:
-                compounded = calculate_compounded_yield(group['MONTHLY_YIELD'])
-                if compounded is not None:
-                    ttm_yields[fund_id] = compounded
+        # Compounded yield per fund, only if we have at least 6 months of data
+        ttm_yields = calculate_compounded_yields(
+            historical['MONTHLY_YIELD'], historical['FUND_ID'], min_months=6
+        )
         
         # Map to period_df
         result_df['AVG_ANNUAL_YIELD_TRAILING_1YR'] = result_df['FUND_ID'].map(ttm_yields)